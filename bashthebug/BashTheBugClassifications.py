@@ -1,18 +1,303 @@
 #! /usr/bin/env python
 
-import os, math, copy
+import os, io, math, copy, sqlite3, functools, inspect, statistics, time
+
+import dateutil.parser
 
 import pandas, numpy
 from tqdm import tqdm
 
 import pyniverse
 
+from . import engines, filenames, __version__
+from .ParseErrors import ParseErrors
+from .ResultCache import ResultCache
+from .DawidSkene import DawidSkene
+from .PartialAggregates import PartialAggregates
+from .PipelinedReader import PipelinedReader, is_compressed, save_compressed_pickle
+from .VolunteerStatistics import VolunteerStatistics
+
+# the columns extract_classifications() derives from each subject's filename
+FILENAME_FIELDS = [
+    "filename",
+    "plate_image",
+    "plate_design",
+    "drug",
+    "plate",
+    "study_id",
+    "reading_day",
+    "site",
+]
+
+# the decoded columns written to, and read back from, the SQLite store
+SQLITE_COLUMNS = [
+    ("classification_id", "INTEGER PRIMARY KEY"),
+    ("user_name", "TEXT"),
+    ("created_at", "TEXT"),
+    ("subject_ids", "INTEGER"),
+    ("filename", "TEXT"),
+    ("plate_image", "TEXT"),
+    ("plate", "TEXT"),
+    ("drug", "TEXT"),
+    ("site", "TEXT"),
+    ("study_id", "TEXT"),
+    ("reading_day", "INTEGER"),
+    ("plate_design", "TEXT"),
+    ("bashthebug_dilution", "INTEGER"),
+    ("task_duration", "REAL"),
+]
+
+SQLITE_INDEXES = {
+    "idx_study_reading_day": ["study_id", "reading_day"],
+    "idx_plate_drug": ["plate", "drug"],
+    "idx_created_at": ["created_at"],
+}
+
+
+def _call_signature(method, self, args, kwargs):
+    # normalise the arguments so that e.g. f() and f(index="PLATEIMAGE") share a cache entry
+    bound = inspect.signature(method).bind(self, *args, **kwargs)
+    bound.apply_defaults()
+    return (method.__name__, list(bound.arguments.items())[1:])
+
+
+def _sqlite_query(from_date=None, to_date=None, **columns):
+    # the SELECT for load_sqlite(); each column that is given is an equality filter
+    clauses = []
+    parameters = []
+    for column, value in columns.items():
+        if value is not None:
+            clauses.append(column + " = ?")
+            parameters.append(value)
+
+    if from_date:
+        clauses.append("created_at > ?")
+        parameters.append(dateutil.parser.parse(from_date).date().isoformat())
+
+    if to_date:
+        clauses.append("created_at < ?")
+        parameters.append(dateutil.parser.parse(to_date).date().isoformat())
+
+    query = "SELECT * FROM classifications"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+
+    return query, parameters
+
+
+def _table_fingerprint(table):
+    # cheap enough to take on every call, and catches the table being filtered or replaced outside the methods
+    return (
+        len(table),
+        int(pandas.util.hash_pandas_object(table.index).sum()),
+        tuple(table.columns),
+    )
+
+
+def _cached(*attributes):
+    """Decorator that stores the given attributes in the result cache after the method has run,
+    and restores them instead of running the method if they are already there."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._cache_context is None:
+                return method(self, *args, **kwargs)
+
+            signature = _call_signature(method, self, args, kwargs)
+
+            # the methods that have run are kept as well since they can change values without changing the rows
+            key = self.cache.key(
+                self._cache_context,
+                _table_fingerprint(self.classifications),
+                self._cache_history,
+                signature,
+            )
+            hit, values = self.cache.load(self._cache_prefix, key)
+
+            if hit:
+                for attribute, value in zip(attributes, values):
+                    if isinstance(value, ParseErrors):
+                        # strict is not part of the cache key, so keep this run's setting
+                        self.parse_errors.restore(value)
+                    else:
+                        setattr(self, attribute, value)
+            else:
+                method(self, *args, **kwargs)
+                self.cache.save(
+                    self._cache_prefix,
+                    key,
+                    [getattr(self, attribute) for attribute in attributes],
+                )
+
+            if "classifications" in attributes:
+                self._cache_history.append(signature)
+
+        return wrapper
+
+    return decorator
+
+
+def _changes_classifications(method):
+    """Decorator for methods that alter the classifications table, so later cache keys depend on them having run."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._cache_history.append(_call_signature(method, self, args, kwargs))
+        return result
+
+    return wrapper
+
 
 class BashTheBugClassifications(pyniverse.Classifications):
-    def __init__(self, flavour=None, *args, **kwargs):
+    def __init__(
+        self,
+        flavour=None,
+        engine=None,
+        strict=False,
+        cache_dir=None,
+        cache_max_bytes=2 * 1024**3,
+        *args,
+        **kwargs
+    ):
         assert flavour in ["regular", "pro"], "flavour not recognised! " + flavour
         self.flavour = flavour
-        super().__init__(*args, **kwargs)
+
+        # collects the rows that cannot be parsed rather than printing each one
+        self.parse_errors = ParseErrors(strict=strict)
+
+        # which dataframe engine to use for the aggregations (polars, duckdb or pandas)
+        self.engine = engines.resolve_engine(engine)
+
+        # a SQLite store written by save_sqlite() can be used instead of a zooniverse or pickle file
+        sqlite_file = kwargs.pop("sqlite_file", None)
+
+        # optionally only decode a stratified sample of the subjects for a quick look
+        sample_fraction = kwargs.pop("sample_fraction", None)
+        sample_seed = kwargs.pop("sample_seed", 0)
+
+        # compressed exports are decompressed in a background thread whilst they are parsed
+        self.pipelined = kwargs.pop("pipelined", True)
+
+        # how long each stage of the run took, see throughput()
+        self.stage_throughput = {}
+
+        # derived tables are only cached when reading a zooniverse file, since that is what the cache keys fingerprint
+        self.cache = None
+        self._cache_context = None
+        self._cache_history = []
+
+        if cache_dir is not None and "zooniverse_file" in kwargs:
+            self.cache = ResultCache(cache_dir, max_bytes=cache_max_bytes)
+            self._cache_prefix = self.cache.prefix(kwargs["zooniverse_file"])
+            self._cache_context = (
+                self.cache.fingerprint(kwargs["zooniverse_file"]),
+                self.flavour,
+                kwargs.get("from_date", None),
+                kwargs.get("to_date", None),
+                kwargs.get("live_rows", True),
+                __version__,
+            )
+
+            key = self.cache.key(self._cache_context, "__init__")
+            hit, values = self.cache.load(self._cache_prefix, key)
+
+            if hit:
+                self.classifications, self.total_classifications = values
+            else:
+                self._read(*args, **kwargs)
+                self.cache.save(
+                    self._cache_prefix,
+                    key,
+                    [self.classifications, self.total_classifications],
+                )
+        else:
+            self._read(*args, **kwargs)
+
+        if sqlite_file is not None:
+            self.load_sqlite(
+                sqlite_file,
+                from_date=kwargs.get("from_date", None),
+                to_date=kwargs.get("to_date", None),
+            )
+
+        if sample_fraction is not None:
+            self.select_sample(sample_fraction, seed=sample_seed)
+
+    def _read(self, *args, **kwargs):
+        if "zooniverse_file" not in kwargs:
+            super().__init__(*args, **kwargs)
+            return
+
+        filename = kwargs["zooniverse_file"]
+        reader = None
+
+        if self.pipelined and is_compressed(filename):
+            reader = PipelinedReader(filename)
+            kwargs["zooniverse_file"] = io.BufferedReader(reader)
+
+        start = time.perf_counter()
+        try:
+            super().__init__(*args, **kwargs)
+        finally:
+            if reader is not None:
+                kwargs["zooniverse_file"].close()
+        seconds = time.perf_counter() - start
+
+        if reader is not None:
+            self._record_stage(
+                "decompress",
+                reader.decompress_seconds,
+                n_bytes=reader.decompressed_bytes,
+            )
+            # the parser is only busy when it is not waiting for decompressed data
+            self._record_stage(
+                "parse",
+                seconds - reader.wait_seconds,
+                n_bytes=reader.decompressed_bytes,
+                rows=self.total_classifications,
+            )
+        else:
+            self._record_stage(
+                "parse",
+                seconds,
+                n_bytes=os.path.getsize(filename),
+                rows=self.total_classifications,
+            )
+
+    def _record_stage(self, stage, seconds, n_bytes=None, rows=None):
+        self.stage_throughput[stage] = {
+            "seconds": seconds,
+            "bytes": n_bytes,
+            "rows": rows,
+        }
+
+    def throughput(self):
+        """Return a table of how long each stage of the run took and how much data it got through per second.
+
+        The decompress and parse stages overlap when reading a compressed export, so the slower of the two is the
+        one limiting the run.
+        """
+
+        table = pandas.DataFrame.from_dict(
+            self.stage_throughput,
+            orient="index",
+            columns=["seconds", "bytes", "rows"],
+        )
+        table["MB/s"] = table["bytes"] / 1024**2 / table["seconds"]
+        table["rows/s"] = table["rows"] / table["seconds"]
+
+        return table
+
+    def save_pickle(self, filename, threads=None):
+        """Save the classifications to a pickle, compressing .bz2 and .zst files with several threads."""
+
+        start = time.perf_counter()
+        n_bytes = save_compressed_pickle(
+            self.classifications, filename, threads=threads
+        )
+        self._record_stage("compress", time.perf_counter() - start, n_bytes=n_bytes)
 
     def _remove_values_from_list(self, the_list, threshold):
         return numpy.array([value for value in the_list if value >= threshold]).astype(
@@ -95,37 +380,39 @@ class BashTheBugClassifications(pyniverse.Classifications):
 
         return (count, n_failed, n_cannot_read, n_valid, median, mean, std, mmin, mmax)
 
+    @_cached("measurements")
     def create_measurements_table(self, index="PLATEIMAGE"):
         assert index in ["PLATEIMAGE", "PLATE"], "specified index not recognised!"
 
-        # create a table of measurements, additional measurements (e.g. Vizion or AMyGDA) can be merged in later
         if index == "PLATEIMAGE":
+            keys = ["plate_image", "drug"]
+        else:
+            keys = ["plate", "reading_day", "drug"]
+
+        self.measurements = self._aggregate_measurements(self.classifications, keys)
+
+        # self.classifications.drop(['metadata','annotations','subject_data','filename'], axis=1, inplace=True)
+
+    def _aggregate_measurements(self, table, keys):
+        # create a table of measurements, additional measurements (e.g. Vizion or AMyGDA) can be merged in later
+        if self.engine == "pandas":
             # self.measurements=self.classifications[['plate_image','drug','bashthebug_dilution']].groupby(['plate_image','drug']).agg({'bashthebug_dilution':['median','mean','std','min','max','count']})
             foo = (
-                self.classifications[["plate_image", "drug", "bashthebug_dilution"]]
-                .groupby(["plate_image", "drug"])
+                table[keys + ["bashthebug_dilution"]]
+                .groupby(keys)
                 .agg(self._custom_aggregate_classifications)
             )
 
-            self.measurements = pandas.DataFrame(
+            measurements = pandas.DataFrame(
                 foo["bashthebug_dilution"].tolist(), index=foo.index
             )
 
         else:
-            # self.measurements=self.classifications[['plate','reading_day','drug','bashthebug_dilution']].groupby(['plate','reading_day','drug']).agg({'bashthebug_dilution':['median','mean','std','min','max','count']})
-            foo = (
-                self.classifications[
-                    ["plate", "reading_day", "drug", "bashthebug_dilution"]
-                ]
-                .groupby(["plate", "reading_day", "drug"])
-                .agg(self._custom_aggregate_classifications)
+            measurements = engines.aggregate_measurements(
+                table, keys, self.flavour, self.engine
             )
 
-            self.measurements = pandas.DataFrame(
-                foo["bashthebug_dilution"].tolist(), index=foo.index
-            )
-
-        self.measurements.columns = [
+        measurements.columns = [
             "count",
             "n_failed",
             "n_cannot_read",
@@ -137,7 +424,7 @@ class BashTheBugClassifications(pyniverse.Classifications):
             "max",
         ]
 
-        self.measurements = self.measurements[
+        measurements = measurements[
             [
                 "median",
                 "mean",
@@ -151,8 +438,9 @@ class BashTheBugClassifications(pyniverse.Classifications):
             ]
         ]
 
-        # self.classifications.drop(['metadata','annotations','subject_data','filename'], axis=1, inplace=True)
+        return measurements
 
+    @_cached("durations")
     def create_durations_table(self, index="PLATEIMAGE"):
         assert (
             "task_duration" in self.classifications.columns
@@ -161,20 +449,248 @@ class BashTheBugClassifications(pyniverse.Classifications):
         assert index in ["PLATEIMAGE", "PLATE"], "specified index not recognised!"
 
         if index == "PLATEIMAGE":
+            keys = ["plate_image", "drug"]
+            statistics = ["mean", "std"]
+        else:
+            keys = ["plate", "reading_day", "drug"]
+            statistics = ["median", "mean", "std", "min", "max", "count"]
+
+        if self.engine == "pandas":
             self.durations = (
-                self.classifications[["plate_image", "drug", "task_duration"]]
-                .groupby(["plate_image", "drug"])
-                .agg({"task_duration": ["mean", "std"]})
+                self.classifications[keys + ["task_duration"]]
+                .groupby(keys)
+                .agg({"task_duration": statistics})
             )
         else:
-            self.durations = (
-                self.classifications[["plate", "reading_day", "drug", "task_duration"]]
-                .groupby(["plate", "reading_day", "drug"])
-                .agg(
-                    {"task_duration": ["median", "mean", "std", "min", "max", "count"]}
-                )
+            self.durations = engines.aggregate_durations(
+                self.classifications, keys, statistics, self.engine
+            )
+
+    def save_partial_aggregates(self, filename, index="PLATEIMAGE"):
+        """Save the mergeable partial aggregates of this (shard of the) classifications to a pickle file.
+
+        With the PLATE index every task_duration is kept as well, so that the median can be merged, and the file then
+        grows with the number of classifications rather than the number of groups."""
+
+        PartialAggregates.from_classifications(
+            self.classifications, self.flavour, index=index
+        ).save(filename)
+
+    def load_partial_aggregates(self, filenames):
+        """Merge partial aggregates saved by save_partial_aggregates() and create the MEASUREMENTS table, and
+        the DURATIONS table if the task durations were included, exactly as if all the classifications had been
+        processed together."""
+
+        partial = PartialAggregates.merge(
+            [PartialAggregates.load(i) for i in filenames]
+        )
+
+        assert (
+            partial.flavour == self.flavour
+        ), "partial aggregates are for a different flavour of BashTheBug!"
+
+        self.measurements = self._aggregate_measurements(partial.expand(), partial.keys)
+
+        if partial.durations is not None:
+            self.durations = partial.durations_table()
+
+    @_changes_classifications
+    def select_shard(self, shard, n_shards):
+        """Only keep the classifications of every n_shards-th subject, starting from shard, so that a run can
+        be split across independent jobs."""
+
+        assert 0 <= shard < n_shards, "shard must be between 0 and n_shards-1"
+
+        self.classifications = self.classifications.loc[
+            self.classifications["subject_ids"] % n_shards == shard
+        ]
+
+        self.total_classifications = len(self.classifications)
+
+    @_changes_classifications
+    def select_sample(self, fraction, seed=0):
+        """Only keep the classifications of a reproducible, stratified sample of the subjects.
+
+        Subjects are stratified by study_id, site and drug, which are parsed from the filename of each subject rather
+        than each classification, and ceil(fraction x subjects) are chosen from every stratum by hashing the
+        subject_ids with the seed, so the same subjects are picked each time. The strata are recorded in the
+        SAMPLE_STRATA table so that sample_summary() can later attach confidence intervals.
+
+        Args:
+            fraction (float): the proportion of subjects to keep, between 0 and 1
+            seed (int): change this to draw a different sample
+        """
+
+        assert 0 < fraction <= 1, "sample fraction must be between 0 and 1"
+
+        subjects = self.classifications.drop_duplicates("subject_ids")
+
+        if "filename" in subjects.columns:
+            filename = subjects["filename"]
+        else:
+            filename = subjects.apply(self._extract_subject_filename, axis=1)
+        filename = pandas.Series(filename, index=subjects.index, dtype=object)
+
+        fields = filenames.parse_filenames(filename, self.flavour).reindex(filename)
+
+        strata = pandas.DataFrame(
+            {
+                "subject_ids": subjects["subject_ids"].to_numpy(),
+                "study_id": fields["study_id"].fillna("Unknown").to_numpy(),
+                "site": fields["site"].fillna("").to_numpy(),
+                "drug": fields["drug"].fillna("").to_numpy(),
+                "plate_image": fields["plate_image"].to_numpy(),
+            }
+        )
+
+        # a hash of the subject_ids gives the same random order whatever else is in the export
+        # (only object arrays are hashed with the key, hence the conversion to strings)
+        strata["hash"] = pandas.util.hash_array(
+            strata["subject_ids"].astype(str).to_numpy(dtype=object),
+            hash_key=("%016i" % seed)[-16:],
+        )
+        strata["rank"] = strata.groupby(["study_id", "site", "drug"])["hash"].rank(
+            method="first"
+        )
+        n_subjects = strata.groupby(["study_id", "site", "drug"])[
+            "subject_ids"
+        ].transform("count")
+        strata["sampled"] = strata["rank"] <= numpy.ceil(fraction * n_subjects)
+
+        # how many subjects in the whole export share each row of the MEASUREMENTS table
+        strata["group_subjects"] = strata.groupby(["plate_image", "drug"])[
+            "subject_ids"
+        ].transform("count")
+
+        self.sample_fraction = fraction
+        self.sample_subjects = strata.set_index("subject_ids")[
+            ["study_id", "site", "drug", "plate_image", "group_subjects", "sampled"]
+        ]
+        self.sample_strata = strata.groupby(["study_id", "site", "drug"]).agg(
+            n_subjects=("subject_ids", "count"), n_sampled=("sampled", "sum")
+        )
+
+        sampled = strata.loc[strata["sampled"], "subject_ids"]
+
+        self.classifications = self.classifications.loc[
+            self.classifications["subject_ids"].isin(sampled)
+        ]
+
+        self.total_classifications = len(self.classifications)
+
+    def sample_summary(self, confidence=0.95):
+        """Estimate the summary counts and agreement rates for the whole export from a sample.
+
+        Needs select_sample() (or the sample_fraction argument) and then create_measurements_table() with the
+        default PLATEIMAGE index. The sampling unit is the subject, so every statistic is first worked out per
+        sampled subject: its number of classifications, its share of the MEASUREMENTS row it belongs to (a row
+        shared by k subjects counts 1/k towards measured, cannot_read or insufficient) and its numbers of exact,
+        essential and valid agreements with the consensus. The counts are stratified estimates of the totals over
+        all subjects and the agreement rates are ratios of two such totals, i.e. per valid classification. The
+        normal-approximation confidence intervals include the finite population correction, so a sample of every
+        subject returns the full-run numbers with no uncertainty.
+
+        Returns:
+            pandas.DataFrame: indexed by statistic, with estimate, lower and upper columns
+        """
+
+        assert hasattr(
+            self, "sample_strata"
+        ), "no sample taken; run select_sample() first!"
+        assert list(self.measurements.index.names) == [
+            "plate_image",
+            "drug",
+        ], "sample_summary() needs the MEASUREMENTS table indexed by PLATEIMAGE"
+
+        keys = ["plate_image", "drug"]
+        strata = ["study_id", "site", "drug"]
+
+        subjects = self.sample_subjects.loc[self.sample_subjects["sampled"]].copy()
+
+        subjects["classifications"] = (
+            self.classifications.groupby("subject_ids")
+            .size()
+            .reindex(subjects.index, fill_value=0)
+        )
+
+        # the outcome of each subject's row of the MEASUREMENTS table, shared between the subjects in that row
+        median = pandas.merge(
+            subjects[keys],
+            self.measurements[["median"]].assign(measurement=True),
+            left_on=keys,
+            right_index=True,
+            how="left",
+        )
+        share = 1 / subjects["group_subjects"]
+        subjects["measured"] = ((median["median"] > 0) * share).fillna(0)
+        subjects["cannot_read"] = ((median["median"] == -1) * share).fillna(0)
+        subjects["insufficient"] = (
+            (median["measurement"].notna() & median["median"].isna()) * share
+        ).fillna(0)
+
+        # agreement of each valid classification with the consensus of its image
+        table = pandas.merge(
+            self.classifications[keys + ["subject_ids", "bashthebug_dilution"]],
+            self.measurements[["median"]],
+            left_on=keys,
+            right_index=True,
+            how="inner",
+        )
+        valid = (table["bashthebug_dilution"] > 0) & (table["median"] > 0)
+        delta = (table["bashthebug_dilution"] - table["median"]).abs()
+        agreement = pandas.DataFrame(
+            {
+                "subject_ids": table["subject_ids"],
+                "valid": valid,
+                "exact": valid & (delta == 0),
+                "essential": valid & (delta <= 1),
+            }
+        ).groupby("subject_ids")
+        for column in ["valid", "exact", "essential"]:
+            subjects[column] = (
+                agreement[column].sum().reindex(subjects.index, fill_value=0)
             )
 
+        def total(column):
+            # stratified estimate of the total over all subjects, and its variance
+            grouped = subjects.groupby(strata)[column]
+            per_stratum = pandas.DataFrame(
+                {"mean": grouped.mean(), "variance": grouped.var(ddof=1).fillna(0)}
+            ).join(self.sample_strata, how="inner")
+
+            n_subjects = per_stratum["n_subjects"]
+            n_sampled = per_stratum["n_sampled"]
+            finite_population = 1 - n_sampled / n_subjects
+
+            estimate = (n_subjects * per_stratum["mean"]).sum()
+            variance = (
+                n_subjects**2 * finite_population * per_stratum["variance"] / n_sampled
+            ).sum()
+            return estimate, variance
+
+        z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+        rows = {}
+        for statistic in ["classifications", "measured", "cannot_read", "insufficient"]:
+            estimate, variance = total(statistic)
+            error = z * math.sqrt(variance)
+            rows[statistic] = (estimate, estimate - error, estimate + error)
+
+        n_valid, _ = total("valid")
+        for statistic in ["exact", "essential"]:
+            n_agree, _ = total(statistic)
+            ratio = n_agree / n_valid if n_valid > 0 else numpy.nan
+
+            # linearise the ratio so the usual variance of a stratified total applies to its residuals
+            subjects["residual"] = subjects[statistic] - ratio * subjects["valid"]
+            _, variance = total("residual")
+            error = z * math.sqrt(variance) / n_valid if n_valid > 0 else numpy.nan
+            rows[statistic] = (ratio, ratio - error, ratio + error)
+
+        return pandas.DataFrame.from_dict(
+            rows, orient="index", columns=["estimate", "lower", "upper"]
+        )
+
     def merge_other_dataset(self, filename=None, new_column=None):
         # find out the file extension so we can load in the dataset using the right method
         stem, file_extension = os.path.splitext(filename)
@@ -230,149 +746,65 @@ class BashTheBugClassifications(pyniverse.Classifications):
             how="left",
         )
 
+    @_changes_classifications
     def extract_cryptic1_fields(self):
-        # self.classifications['reading_day']=self.classifications['plate_image'].str.split('-').str[-1].astype(int)
-        self.classifications["reader"] = (
-            self.classifications["plate_image"].str.split("-").str[-2].astype(int)
-        )
-        self.classifications["replicate"] = (
-            self.classifications["plate_image"].str.split("-").str[-3].astype(int)
-        )
-        self.classifications["site"] = (
-            self.classifications["plate_image"].str.split("-").str[-4].astype(int)
-        )
+        fields = filenames.parse_plate_images(self.classifications["plate_image"])
+        fields = fields.reindex(self.classifications["plate_image"])
+        for column in ["reader", "replicate", "site"]:
+            self.classifications[column] = fields[column].astype(int).to_numpy()
 
     def determine_study(self, row):
-        try:
-            if row.filename[:3] in ("H37", "CRY"):
-                return "CRyPTIC1"
-            else:
-                return "CRyPTIC2"
-        except:
-            return "Unknown"
+        study_id = filenames.determine_study(row.filename)
+        return "Unknown" if study_id is None else study_id
 
     def extract_reading_day(self, row):
-        if row["study_id"] == "CRyPTIC1":
-            reading_day = int(row["plate_image"].split("-")[-1])
-        elif row["study_id"] == "CRyPTIC2":
-            if "UKMYC" in row["plate_image"]:
-                reading_day = int(row["plate_image"].split("-")[-2])
-            else:
-                reading_day = int(row["plate_image"].split("-")[-1])
-        else:
-            reading_day = None
-        return reading_day
+        if row["study_id"] not in ("CRyPTIC1", "CRyPTIC2"):
+            return None
+        return filenames.parse_plate_image(row["plate_image"])["reading_day"]
 
     def extract_site(self, row):
-        if row["study_id"] == "CRyPTIC1":
-            site = row["plate_image"].split("-")[-4]
-        elif row["study_id"] == "CRyPTIC2":
-            site = row["plate_image"][:2]
-        else:
-            site = None
-        return site
+        if row["study_id"] not in ("CRyPTIC1", "CRyPTIC2"):
+            return None
+        return filenames.parse_plate_image(row["plate_image"])["site"]
 
-    def _extract_plateimage(self, row):
-        # find out the filename
+    def _extract_subject_filename(self, row):
+        # the last image in the subject metadata, without its extension
         filename = None
         try:
             for i in row.subject_data[str(row.subject_ids)]:
                 if (".png" in i) or (".jpg" in i) or i in ["Filename", "Image"]:
                     filename = row.subject_data[str(row.subject_ids)][i][:-4]
         except:
-            print("Problem parsing " + row.classification_id)
+            self.parse_errors.record("filename", row.name)
+        return filename
 
-        # find out the study id
-        if filename == None:
-            study_id = None
-        elif filename[:3] in ("H37", "CRY"):
-            study_id = "CRyPTIC1"
-        else:
-            study_id = "CRyPTIC2"
+    @_cached("classifications", "parse_errors")
+    def extract_classifications(self):
+        self.parse_errors.reset()
 
-        # extract drug
-        drug = None
-        if filename is not None:
-            drug = filename[-3:]
-
-        # extract plate_image and plate_design
-        if filename is None:
-            plate_image = None
-            plate_design = None
-        elif "UKMYC" in filename:
-            plate_image = filename.split("-UKMYC")[0]
-            if self.flavour == "regular":
-                plate_design = filename.split(plate_image + "-")[1].split(
-                    "-zooniverse"
-                )[0]
-            elif self.flavour == "pro":
-                plate_design = filename.split(plate_image + "-")[1].split(
-                    "-discrepancy"
-                )[0]
-        else:
-            if self.flavour == "regular":
-                plate_image = filename.split("-zooniverse-")[0]
-            elif self.flavour == "pro":
-                plate_image = filename.split("-discrepancy-")[0]
-            plate_design = "UKMYC5"
-
-        # extract plate
-        plate = None
-        if plate_image is not None:
-            if "UKMYC" in plate_image:
-                foo = plate_image[:-7]
-            else:
-                foo = plate_image
-            location = foo.rfind("-")
-            plate = foo[:location]
-
-        # extract site and reading_day
-        if study_id == "CRyPTIC1":
-            reading_day = int(plate_image.split("-")[-1])
-            site = plate_image.split("-")[-4]
-        elif study_id == "CRyPTIC2":
-            site = plate_image[:2]
-            if "UKMYC" in plate_image:
-                reading_day = int(plate_image.split("-")[-2])
-            else:
-                try:
-                    reading_day = int(plate_image.split("-")[-1])
-                except:
-                    reading_day = None
-        else:
-            site = None
-            reading_day = None
+        start = time.perf_counter()
 
-        return pandas.Series(
-            [
-                filename,
-                plate_image,
-                plate_design,
-                drug,
-                plate,
-                study_id,
-                reading_day,
-                site,
-            ]
-        )
-
-    def extract_classifications(self):
         # tqdm.pandas(desc='extracting filename')
         # self.classifications['filename']=self.classifications.progress_apply(self._extract_filename2,axis=1)
 
-        tqdm.pandas(desc="extracting metadata")
-        self.classifications[
-            [
-                "filename",
-                "plate_image",
-                "plate_design",
-                "drug",
-                "plate",
-                "study_id",
-                "reading_day",
-                "site",
-            ]
-        ] = self.classifications.progress_apply(self._extract_plateimage, axis=1)
+        tqdm.pandas(desc="extracting filename")
+        filename = self.classifications.progress_apply(
+            self._extract_subject_filename, axis=1
+        )
+
+        # each distinct filename is only parsed once
+        fields = filenames.parse_filenames(filename, self.flavour).reindex(filename)
+        self.classifications["filename"] = filename
+        for column in FILENAME_FIELDS[1:]:
+            self.classifications[column] = fields[column].to_numpy()
+
+        failed = self.classifications["reading_day"].isna() & filename.notna()
+        for classification_id, plate_image in self.classifications.loc[
+            failed, "plate_image"
+        ].items():
+            self.parse_errors.record(
+                "reading_day", classification_id, detail=plate_image
+            )
 
         # tqdm.pandas(desc='extracting drug')
         # self.classifications['drug']=self.classifications.progress_apply(self._extract_drug,axis=1)
@@ -414,13 +846,25 @@ class BashTheBugClassifications(pyniverse.Classifications):
         # tqdm.pandas(desc='extracting site')
         # self.classifications['site']=self.classifications.progress_apply(self.extract_site,axis=1)
 
+        self._record_stage(
+            "extract",
+            time.perf_counter() - start,
+            rows=len(self.classifications),
+        )
+
+    @_changes_classifications
     def calculate_consensus_median(self):
         # create a consensus based on the median
-        self.consensus_median = (
-            self.classifications[["filename", "bashthebug_dilution"]]
-            .groupby("filename")
-            .median()
-        )
+        if self.engine == "pandas":
+            self.consensus_median = (
+                self.classifications[["filename", "bashthebug_dilution"]]
+                .groupby("filename")
+                .median()
+            )
+        else:
+            self.consensus_median = engines.consensus_median(
+                self.classifications, self.engine
+            )
 
         # rename it
         self.consensus_median.columns = ["bashthebug_median"]
@@ -440,6 +884,97 @@ class BashTheBugClassifications(pyniverse.Classifications):
             - self.classifications["bashthebug_median"]
         )
 
+    def create_volunteer_statistics(self, statistics=None):
+        """Create (or add to) a VOLUNTEER_STATISTICS table of how each volunteer compares with the consensus.
+
+        Args:
+            statistics (VolunteerStatistics): existing statistics, e.g. from an earlier export or the other flavour,
+            to add these classifications to. Any made no later than its last_created_at for this flavour are skipped.
+        """
+
+        if statistics is None:
+            statistics = VolunteerStatistics()
+
+        self.volunteer_statistics = statistics.update(
+            self.classifications, self.flavour
+        )
+
+    def calculate_consensus_dawid_skene(self, index="PLATEIMAGE", **kwargs):
+        """Estimate a reliability-weighted consensus dilution using the Dawid-Skene EM algorithm.
+
+        Adds ds_dilution and ds_confidence columns next to the median in the MEASUREMENTS table, and creates a
+        VOLUNTEER_RELIABILITY table. Cannot read codes are treated as a single class, reported as -1, and failed
+        classifications are ignored. Any keyword arguments are passed on to DawidSkene.
+
+        Args:
+            index (str): PLATEIMAGE or PLATE, must match the index used to create the MEASUREMENTS table
+        """
+
+        assert index in ["PLATEIMAGE", "PLATE"], "specified index not recognised!"
+
+        if index == "PLATEIMAGE":
+            keys = ["plate_image", "drug"]
+        else:
+            keys = ["plate", "reading_day", "drug"]
+
+        assert (
+            list(self.measurements.index.names) == keys
+        ), "MEASUREMENTS table has a different index; run create_measurements_table(index) first!"
+
+        failed, cannot_read_from, cannot_read_to, _, _ = engines.flavour_rules(
+            self.flavour
+        )
+
+        # classifications without a volunteer cannot inform anyone's confusion matrix
+        table = self.classifications[
+            ["user_name", "bashthebug_dilution"] + keys
+        ].dropna(subset=keys + ["user_name"])
+
+        dilution = table["bashthebug_dilution"].to_numpy(dtype=int)
+        cannot_read = (dilution >= cannot_read_from) & (dilution <= cannot_read_to)
+        usable = (dilution > 0) | cannot_read
+
+        # each subject (column of the volunteer x subject matrix) is one row of the MEASUREMENTS table
+        grouped = table.groupby(keys, sort=True)
+
+        labels = numpy.where(cannot_read, -1, dilution)[usable]
+        subjects = grouped.ngroup().to_numpy()[usable]
+        volunteers = table["user_name"].to_numpy()[usable]
+
+        self.dawid_skene = DawidSkene(**kwargs).fit(volunteers, subjects, labels)
+
+        groups = grouped.size().index[self.dawid_skene.subjects]
+
+        consensus = pandas.DataFrame(
+            {
+                "ds_dilution": self.dawid_skene.consensus,
+                "ds_confidence": self.dawid_skene.confidence,
+            },
+            index=groups,
+        )
+
+        for column in ["ds_dilution", "ds_confidence"]:
+            if column in self.measurements.columns:
+                self.measurements.drop(columns=column, inplace=True)
+
+        position = self.measurements.columns.get_loc("median") + 1
+        for offset, column in enumerate(["ds_dilution", "ds_confidence"]):
+            self.measurements.insert(
+                position + offset,
+                column,
+                consensus[column].reindex(self.measurements.index),
+            )
+
+        self.volunteer_reliability = pandas.DataFrame(
+            {
+                "classifications": self.dawid_skene.volunteer_classifications,
+                "reliability": self.dawid_skene.reliability,
+                "pooled": self.dawid_skene.pooled,
+            },
+            index=pandas.Index(self.dawid_skene.volunteers, name="user_name"),
+        )
+
+    @_changes_classifications
     def filter_study(self, study):
         self.classifications = self.classifications.loc[
             self.classifications["study_id"] == study
@@ -447,6 +982,7 @@ class BashTheBugClassifications(pyniverse.Classifications):
 
         self.total_classifications = len(self.classifications)
 
+    @_changes_classifications
     def filter_readingday(self, reading_day):
         self.classifications = self.classifications.loc[
             self.classifications["reading_day"] == reading_day
@@ -454,13 +990,118 @@ class BashTheBugClassifications(pyniverse.Classifications):
 
         self.total_classifications = len(self.classifications)
 
+    @_cached("users", "total_users", "gini_coefficient")
+    def create_users_table(self):
+        super().create_users_table()
+
+    @_changes_classifications
+    def calculate_task_durations(self):
+        super().calculate_task_durations()
+
+    @_changes_classifications
+    def create_misc_fields(self):
+        super().create_misc_fields()
+
+    def save_sqlite(self, filename, if_exists="replace"):
+        """Write the decoded classifications to an indexed SQLite database.
+
+        Args:
+            filename (str): path to the SQLite database, created if it does not exist
+            if_exists (str): replace any existing table, or append to it (rows with the same classification_id are overwritten)
+        """
+
+        assert if_exists in ["replace", "append"], "if_exists must be replace or append"
+
+        names = [name for name, _ in SQLITE_COLUMNS]
+
+        table = self.classifications.reset_index()
+        table = table.reindex(columns=names)
+
+        # store UTC timestamps as ISO strings so that they sort, and hence index, correctly
+        created_at = pandas.to_datetime(table["created_at"], utc=True)
+        table["created_at"] = created_at.dt.strftime("%Y-%m-%d %H:%M:%S")
+
+        table = table.astype(object).where(table.notna(), None)
+
+        connection = sqlite3.connect(filename)
+        with connection:
+            if if_exists == "replace":
+                connection.execute("DROP TABLE IF EXISTS classifications")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS classifications ("
+                + ", ".join(name + " " + kind for name, kind in SQLITE_COLUMNS)
+                + ")"
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO classifications VALUES ("
+                + ", ".join("?" * len(names))
+                + ")",
+                table.itertuples(index=False, name=None),
+            )
+            for index_name, columns in SQLITE_INDEXES.items():
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS "
+                    + index_name
+                    + " ON classifications ("
+                    + ", ".join(columns)
+                    + ")"
+                )
+        connection.close()
+
+    def load_sqlite(
+        self,
+        filename,
+        study_id=None,
+        site=None,
+        drug=None,
+        plate=None,
+        reading_day=None,
+        from_date=None,
+        to_date=None,
+    ):
+        """Load a subset of the classifications from a SQLite database written by save_sqlite().
+
+        Each argument that is not None restricts the rows returned; from_date and to_date behave as they do when reading a zooniverse file.
+        """
+
+        assert os.path.isfile(filename), "SQLite file " + filename + " does not exist!"
+
+        query, parameters = _sqlite_query(
+            study_id=study_id,
+            site=site,
+            drug=drug,
+            plate=plate,
+            reading_day=reading_day,
+            from_date=from_date,
+            to_date=to_date,
+        )
+
+        # the cache keys fingerprint the zooniverse file, so they no longer describe this table
+        self._cache_context = None
+
+        connection = sqlite3.connect(filename)
+        self.classifications = pandas.read_sql_query(
+            query, connection, params=parameters, index_col="classification_id"
+        )
+        connection.close()
+
+        self.classifications["created_at"] = pandas.to_datetime(
+            self.classifications["created_at"], utc=True
+        )
+
+        assert (
+            "filename" in self.classifications.columns
+        ), "SQLite file has no filename column; write it again with save_sqlite()"
+
+        self.total_classifications = len(self.classifications)
+
     def _extract_filename2(self, row):
         try:
             for i in row.subject_data[str(row.subject_ids)]:
                 if (".png" in i) or (".jpg" in i) or i in ["Filename", "Image"]:
                     return row.subject_data[str(row.subject_ids)][i][:-4]
         except:
-            print("Problem parsing " + row.classification_id)
+            self.parse_errors.record("filename", row.name)
 
     def _extract_filename(self, row):
         strain = None
@@ -501,7 +1142,7 @@ class BashTheBugClassifications(pyniverse.Classifications):
                         reading_day = foo[4]
 
         except:
-            print("Problem parsing " + row.classification_id)
+            self.parse_errors.record("filename", row.name)
         return pandas.Series(
             [
                 study_id,
@@ -516,9 +1157,12 @@ class BashTheBugClassifications(pyniverse.Classifications):
             ]
         )
 
+    def _annotation_error(self, row, code, detail=None):
+        return self.parse_errors.record("annotation", row.name, code, detail)
+
     def _parse_annotation(self, row):
         if "task_label" not in row.annotations[0]:
-            return -100
+            return self._annotation_error(row, -100)
 
         else:
             # First thing is to work out what the question/task structure is
@@ -539,12 +1183,11 @@ class BashTheBugClassifications(pyniverse.Classifications):
             elif "Please choose the dilution corresponding to the MIC" in task_label:
                 return -999
             else:
-                print("cannot determine type of task:" + task_label)
-                return -100
+                return self._annotation_error(row, -100, task_label)
 
             # ignore the classifications where a red cross is placed
             if question_type == "testing":
-                return -101
+                return self._annotation_error(row, -101)
 
             else:
                 answer_text = row.annotations[0]["value"]
@@ -583,11 +1226,10 @@ class BashTheBugClassifications(pyniverse.Classifications):
                         "RFB": 6,
                     }
                 else:
-                    print(row)
-                    raise ValueError("plate design not found " + row)
+                    return self._annotation_error(row, -109, row["plate_design"])
 
                 if answer_text is None:
-                    return -102
+                    return self._annotation_error(row, -102)
 
                 elif question_type == "regular_v1":
                     if ("No Growth in either" in answer_text) or (
@@ -609,9 +1251,9 @@ class BashTheBugClassifications(pyniverse.Classifications):
                         try:
                             return int(row.annotations[1]["value"])
                         except:
-                            return -103
+                            return self._annotation_error(row, -103)
                     else:
-                        return -104
+                        return self._annotation_error(row, -104)
 
                 elif question_type == "regular_v2":
                     if ("No Growth in either" in answer_text) or (
@@ -634,7 +1276,7 @@ class BashTheBugClassifications(pyniverse.Classifications):
                     elif row.annotations[0]["value"].isnumeric():
                         return int(row.annotations[0]["value"])
                     else:
-                        return -105
+                        return self._annotation_error(row, -105)
 
                 elif question_type == "pro_v1":
                     if ("No Growth in either" in answer_text) or (
@@ -661,11 +1303,10 @@ class BashTheBugClassifications(pyniverse.Classifications):
                         elif row.annotations[1]["value"] == "Other":
                             return -16
                         elif row.annotations[1]["value"] is None:
-                            return -106
+                            return self._annotation_error(row, -106)
                         else:
-                            raise ValueError(
-                                "unrecognised answer for cannot classify: ",
-                                row.annotations[1],
+                            return self._annotation_error(
+                                row, -110, row.annotations[1]["value"]
                             )
                     elif (
                         len(row.annotations) > 1
@@ -674,6 +1315,6 @@ class BashTheBugClassifications(pyniverse.Classifications):
                         try:
                             return int(row.annotations[1]["value"])
                         except:
-                            return -107
+                            return self._annotation_error(row, -107)
                     else:
-                        return -108
+                        return self._annotation_error(row, -108)
@@ -0,0 +1,130 @@
+#! /usr/bin/env python
+
+import pandas, numpy
+
+
+class DawidSkene(object):
+    """Expectation-maximisation estimate of the consensus of many volunteers (Dawid & Skene, 1979).
+
+    The classifications are held as a sparse volunteer x subject matrix in coordinate form: three equal-length
+    arrays giving the volunteer (row), the subject (column) and the class chosen. Each volunteer has a confusion
+    matrix, the probability they answer class l when the truth is class k, which is learnt alongside the probability
+    of each class for each subject. Volunteers with fewer than min_classifications share a single pooled confusion
+    matrix, which keeps memory bounded and stops the model over-fitting people who only did a handful.
+
+    Args:
+        max_iterations (int): stop after this many EM iterations even if not converged
+        tolerance (float): stop once the relative change in the log-likelihood falls below this
+        min_classifications (int): volunteers with fewer classifications than this share a pooled confusion matrix
+        smoothing (float): pseudo-count added to every confusion matrix and class prior entry
+    """
+
+    def __init__(
+        self, max_iterations=100, tolerance=1e-6, min_classifications=10, smoothing=0.01
+    ):
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.min_classifications = min_classifications
+        self.smoothing = smoothing
+
+    def fit(self, volunteers, subjects, labels):
+        """Fit the model.
+
+        Args:
+            volunteers (array): the volunteer who made each classification, any hashable values
+            subjects (array): the subject each classification was of, any hashable values
+            labels (array): the class each volunteer chose
+        """
+
+        assert (
+            len(volunteers) == len(subjects) == len(labels)
+        ), "volunteers, subjects and labels must all be the same length!"
+
+        # build the sparse volunteer x subject matrix
+        self.rows, self.volunteers = _factorize(volunteers)
+        self.columns, self.subjects = _factorize(subjects)
+        codes, self.classes = _factorize(labels)
+
+        n_subjects = len(self.subjects)
+        n_classes = len(self.classes)
+
+        # map volunteers onto confusion matrices, with the occasional volunteers all sharing the last one
+        counts = numpy.bincount(self.rows, minlength=len(self.volunteers))
+        self.pooled = counts < self.min_classifications
+        model = numpy.cumsum(~self.pooled) - 1
+        n_models = int((~self.pooled).sum()) + 1
+        model[self.pooled] = n_models - 1
+        models = model[self.rows]
+
+        # start from the (soft) majority vote
+        probabilities = numpy.bincount(
+            self.columns * n_classes + codes, minlength=n_subjects * n_classes
+        ).reshape(n_subjects, n_classes)
+        probabilities = probabilities / probabilities.sum(axis=1, keepdims=True)
+
+        self.log_likelihood = None
+
+        for self.iterations in range(1, self.max_iterations + 1):
+            # M-step: class priors and confusion matrices from the current subject probabilities
+            self.prior = probabilities.sum(axis=0) + self.smoothing
+            self.prior /= self.prior.sum()
+
+            confusion = numpy.empty((n_models, n_classes, n_classes))
+            for k in range(n_classes):
+                confusion[:, k, :] = numpy.bincount(
+                    models * n_classes + codes,
+                    weights=probabilities[self.columns, k],
+                    minlength=n_models * n_classes,
+                ).reshape(n_models, n_classes)
+            confusion += self.smoothing
+            confusion /= confusion.sum(axis=2, keepdims=True)
+            self.confusion = confusion
+
+            # E-step: subject probabilities from the priors and each volunteer's confusion matrix
+            log_confusion = numpy.log(confusion)
+            log_probabilities = numpy.tile(numpy.log(self.prior), (n_subjects, 1))
+            for k in range(n_classes):
+                log_probabilities[:, k] += numpy.bincount(
+                    self.columns,
+                    weights=log_confusion[models, k, codes],
+                    minlength=n_subjects,
+                )
+
+            maximum = log_probabilities.max(axis=1, keepdims=True)
+            probabilities = numpy.exp(log_probabilities - maximum)
+            normalisation = probabilities.sum(axis=1, keepdims=True)
+            probabilities /= normalisation
+
+            log_likelihood = float(numpy.sum(maximum + numpy.log(normalisation)))
+
+            converged = self.log_likelihood is not None and abs(
+                log_likelihood - self.log_likelihood
+            ) <= self.tolerance * abs(log_likelihood)
+
+            self.log_likelihood = log_likelihood
+
+            if converged:
+                break
+
+        self.probabilities = probabilities
+        self.consensus = self.classes[probabilities.argmax(axis=1)]
+        self.confidence = probabilities.max(axis=1)
+
+        # how likely each of a volunteer's answers is to be correct, averaged over their classifications
+        self.reliability = numpy.bincount(
+            self.rows,
+            weights=probabilities[self.columns, codes],
+            minlength=len(self.volunteers),
+        ) / numpy.maximum(counts, 1)
+        self.volunteer_classifications = counts
+
+        return self
+
+
+def _factorize(values):
+    # sorted, so the results do not depend on the order of the classifications
+    codes, uniques = pandas.factorize(numpy.asarray(values), sort=True)
+    assert (
+        codes >= 0
+    ).all(), "volunteers, subjects and labels cannot contain missing values!"
+    return codes, numpy.asarray(uniques)
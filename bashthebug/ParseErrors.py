@@ -0,0 +1,127 @@
+#! /usr/bin/env python
+
+import collections, logging
+
+
+class ParseErrors(object):
+    """Accumulates the failures met while decoding a Zooniverse export.
+
+    Rather than printing every bad row, each failure is counted by the stage of the parsing it happened in and by its
+    sentinel code (e.g. -100 to -110 from _parse_annotation), and the first few classification_ids of each kind are kept
+    so they can be looked up afterwards. Call log() once the run's log file has been set up to record them.
+
+    Args:
+        strict (bool): raise a ValueError on the first failure instead of carrying on. Classifications from the testing
+        task (-101) are expected and so never raise.
+        max_samples (int): how many classification_ids to keep for each kind of failure
+    """
+
+    DESCRIPTIONS = {
+        -100: "task label missing or not recognised",
+        -101: "testing task",
+        -102: "no answer given",
+        -103: "dilution answer is not an integer",
+        -104: "no dilution answer given",
+        -105: "answer not recognised",
+        -106: "no reason given for cannot classify",
+        -107: "dilution answer is not an integer",
+        -108: "no dilution answer given",
+        -109: "plate design not recognised",
+        -110: "reason for cannot classify not recognised",
+    }
+
+    EXPECTED = [-101]
+
+    def __init__(self, strict=False, max_samples=10):
+        self.strict = strict
+        self.max_samples = max_samples
+        self.reset()
+
+    def reset(self):
+        self.counts = collections.Counter()
+        self.samples = collections.defaultdict(list)
+
+    def record(self, stage, classification_id, code=None, detail=None):
+        """Record a failure and return its code so that parsers can write return self.parse_errors.record(...)."""
+
+        key = (stage, code)
+
+        if self.strict and code not in self.EXPECTED:
+            message = "problem at stage " + stage + " parsing " + str(classification_id)
+            if code is not None:
+                message += " (" + str(code) + ")"
+            if detail is not None:
+                message += ": " + str(detail)
+            raise ValueError(message)
+
+        self.counts[key] += 1
+
+        if len(self.samples[key]) < self.max_samples:
+            self.samples[key].append((classification_id, detail))
+
+        return code
+
+    def restore(self, other):
+        """Take the failures recorded by another ParseErrors, e.g. one from the result cache, keeping this one's
+        strictness; in strict mode this raises just as recording them would have."""
+
+        if self.strict:
+            for (stage, code), samples in other.samples.items():
+                if code not in self.EXPECTED and samples:
+                    self.record(stage, samples[0][0], code, samples[0][1])
+
+        self.counts = collections.Counter(other.counts)
+        self.samples = collections.defaultdict(
+            list, {key: list(samples) for key, samples in other.samples.items()}
+        )
+
+    @property
+    def total(self):
+        """The number of real failures, i.e. not counting the EXPECTED codes."""
+        return sum(
+            count
+            for (stage, code), count in self.counts.items()
+            if code not in self.EXPECTED
+        )
+
+    @property
+    def expected(self):
+        """The number of classifications given an EXPECTED code, e.g. from the testing task."""
+        return sum(
+            count
+            for (stage, code), count in self.counts.items()
+            if code in self.EXPECTED
+        )
+
+    def log(self, logger=logging):
+        """Write a single summary of all the failures, one line per kind, to the logger."""
+
+        logger.info("%i problems found whilst parsing the classifications" % self.total)
+        logger.info("%i classifications were expected to be skipped" % self.expected)
+
+        for (stage, code), count in sorted(
+            self.counts.items(), key=lambda i: (i[0][0], str(i[0][1]))
+        ):
+            line = "%i problems at stage %s" % (count, stage)
+            if code is not None:
+                line += " with code %i (%s)" % (code, self.DESCRIPTIONS.get(code, ""))
+            examples = [
+                (
+                    str(classification_id)
+                    if detail is None
+                    else str(classification_id) + " [" + str(detail) + "]"
+                )
+                for classification_id, detail in self.samples[(stage, code)]
+            ]
+            line += ", e.g. " + ", ".join(examples)
+            logger.warning(line)
+
+    def __repr__(self):
+        line = "%30s %7i\n" % ("Parsing problems:", self.total)
+        line += "%30s %7i\n" % ("Expected skips:", self.expected)
+        for (stage, code), count in sorted(
+            self.counts.items(), key=lambda i: (i[0][0], str(i[0][1]))
+        ):
+            label = stage if code is None else stage + " " + str(code)
+            line += "%30s %7i\n" % (label + ":", count)
+        return line
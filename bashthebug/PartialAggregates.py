@@ -0,0 +1,218 @@
+#! /usr/bin/env python
+
+import pandas, numpy
+
+from . import __version__
+
+
+class PartialAggregates(object):
+    """Mergeable summary of a shard of the classifications, so that a run can be split across many jobs.
+
+    For each group, (plate_image, drug) or (plate, reading_day, drug), only the histogram of dilution codes is kept,
+    which is all that is needed to recover the failed, cannot read and valid counts as well as the median and mode.
+    Durations are kept as count, sum, sum of squared deviations (for the standard deviation), min and max; when
+    grouping by PLATE the individual durations are also kept since their median cannot be merged otherwise.
+
+    Partial aggregates from different shards are combined with merge() and turned back into the MEASUREMENTS and
+    DURATIONS tables with BashTheBugClassifications.load_partial_aggregates().
+
+    Args:
+        flavour (str): regular or pro
+        index (str): PLATEIMAGE or PLATE
+        histogram (pandas.DataFrame): the group keys, a dilution code and how many times it was given (n)
+        durations (pandas.DataFrame): the group keys with count, sum, m2, min and max of task_duration, or None
+        duration_values (pandas.DataFrame): the group keys and task_duration, only needed for the PLATE index
+    """
+
+    def __init__(self, flavour, index, histogram, durations=None, duration_values=None):
+        assert flavour in ["regular", "pro"], "flavour not recognised! " + flavour
+        assert index in ["PLATEIMAGE", "PLATE"], "specified index not recognised!"
+
+        self.flavour = flavour
+        self.index = index
+        self.histogram = histogram
+        self.durations = durations
+        self.duration_values = duration_values
+
+    @property
+    def keys(self):
+        if self.index == "PLATEIMAGE":
+            return ["plate_image", "drug"]
+        else:
+            return ["plate", "reading_day", "drug"]
+
+    @classmethod
+    def from_classifications(cls, classifications, flavour, index="PLATEIMAGE"):
+        """Summarise a CLASSIFICATIONS table that has been through extract_classifications()."""
+
+        partial = cls(flavour, index, None)
+        keys = partial.keys
+
+        table = classifications.dropna(subset=keys)
+
+        partial.histogram = (
+            table.groupby(keys + ["bashthebug_dilution"])
+            .size()
+            .rename("n")
+            .reset_index()
+            .rename(columns={"bashthebug_dilution": "code"})
+        )
+
+        if "task_duration" in table.columns:
+            durations = table[keys + ["task_duration"]].copy()
+            durations["task_duration"] = durations["task_duration"].astype(float)
+
+            grouped = durations.groupby(keys)["task_duration"]
+            partial.durations = grouped.agg(["count", "sum", "min", "max"])
+            partial.durations["m2"] = (
+                grouped.var(ddof=0).fillna(0) * partial.durations["count"]
+            )
+            partial.durations = partial.durations.reset_index()
+
+            if index == "PLATE":
+                partial.duration_values = durations.dropna(subset=["task_duration"])
+
+        return partial
+
+    @classmethod
+    def merge(cls, partials):
+        """Combine a list of PartialAggregates from different shards into one."""
+
+        assert len(partials) > 0, "nothing to merge!"
+
+        flavour = partials[0].flavour
+        index = partials[0].index
+
+        for partial in partials:
+            assert partial.flavour == flavour, "cannot merge different flavours!"
+            assert partial.index == index, "cannot merge different indices!"
+
+        merged = cls(flavour, index, None)
+        keys = merged.keys
+
+        merged.histogram = (
+            pandas.concat([i.histogram for i in partials])
+            .groupby(keys + ["code"])["n"]
+            .sum()
+            .reset_index()
+        )
+
+        if all(i.durations is not None for i in partials):
+            durations = pandas.concat(
+                [i.durations for i in partials], ignore_index=True
+            )
+
+            grouped = durations.groupby(keys)
+            totals = grouped.agg(
+                {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+            )
+
+            # combine the sums of squared deviations about each shard's own mean (Chan et al.)
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                shard_mean = durations["sum"] / durations["count"]
+                mean = pandas.merge(
+                    durations[keys],
+                    (totals["sum"] / totals["count"]).rename("mean").reset_index(),
+                    on=keys,
+                    how="left",
+                )["mean"].to_numpy()
+            deviation = durations["count"] * (shard_mean - mean) ** 2
+            durations = durations.assign(m2=durations["m2"] + deviation.fillna(0))
+            totals["m2"] = durations.groupby(keys)["m2"].sum()
+
+            merged.durations = totals.reset_index()
+
+            if index == "PLATE":
+                merged.duration_values = pandas.concat(
+                    [i.duration_values for i in partials]
+                )
+
+        return merged
+
+    def expand(self):
+        """Return a table of keys and bashthebug_dilution with one row per classification, as in CLASSIFICATIONS."""
+
+        rows = numpy.repeat(numpy.arange(len(self.histogram)), self.histogram["n"])
+
+        table = self.histogram.iloc[rows][self.keys + ["code"]]
+        table = table.rename(columns={"code": "bashthebug_dilution"})
+
+        return table.reset_index(drop=True)
+
+    def durations_table(self):
+        """Return the DURATIONS table, with the same columns as create_durations_table()."""
+
+        assert (
+            self.durations is not None
+        ), "task_duration was not in the classifications the partial aggregates were made from!"
+
+        durations = self.durations.set_index(self.keys).sort_index()
+
+        count = durations["count"]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            mean = durations["sum"] / count
+            std = numpy.sqrt(durations["m2"] / (count - 1))
+        mean[count == 0] = numpy.nan
+        std[count < 2] = numpy.nan
+
+        if self.index == "PLATEIMAGE":
+            table = pandas.DataFrame({"mean": mean, "std": std})
+        else:
+            median = (
+                self.duration_values.groupby(self.keys)["task_duration"]
+                .median()
+                .reindex(durations.index)
+            )
+            table = pandas.DataFrame(
+                {
+                    "median": median,
+                    "mean": mean,
+                    "std": std,
+                    "min": durations["min"],
+                    "max": durations["max"],
+                    "count": count,
+                }
+            )
+
+        table.columns = pandas.MultiIndex.from_product(
+            [["task_duration"], table.columns]
+        )
+
+        return table
+
+    def save(self, filename):
+        """Save to a pickle; the compression is inferred from the file extension (e.g. .pkl.bz2)."""
+
+        pandas.to_pickle(
+            {
+                "version": __version__,
+                "flavour": self.flavour,
+                "index": self.index,
+                "histogram": self.histogram,
+                "durations": self.durations,
+                "duration_values": self.duration_values,
+            },
+            filename,
+        )
+
+    @classmethod
+    def load(cls, filename):
+        contents = pandas.read_pickle(filename)
+
+        # the parsing codes and the layout can change between versions, so only partials from this one are merged
+        assert contents.get("version") == __version__, (
+            filename
+            + " was written by bashthebug "
+            + str(contents.get("version"))
+            + ", not "
+            + __version__
+            + "; run that shard again"
+        )
+
+        return cls(
+            contents["flavour"],
+            contents["index"],
+            contents["histogram"],
+            durations=contents["durations"],
+            duration_values=contents["duration_values"],
+        )
@@ -0,0 +1,175 @@
+#! /usr/bin/env python
+
+import os, io, bz2, gzip, lzma, zipfile, queue, threading, time, pickle, contextlib
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas
+
+# zstandard is optional; without it .zst files cannot be read or written
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSED_EXTENSIONS = [".gz", ".bz2", ".xz", ".zip", ".zst"]
+
+
+def is_compressed(filename):
+    return os.path.splitext(str(filename))[1] in COMPRESSED_EXTENSIONS
+
+
+class PipelinedReader(io.RawIOBase):
+    """Read-only file object that decompresses a file in a background thread.
+
+    The decompressed data is passed to the reader through a bounded queue of blocks, so that decompression (which
+    releases the GIL in zlib, bz2, lzma and zstandard) overlaps with CSV tokenizing and JSON decoding in the main
+    thread. The time each side spends working and waiting is recorded so the limiting stage can be identified.
+
+    Args:
+        filename (str): a .gz, .bz2, .xz, .zip (first member only) or .zst file
+        block_size (int): how many decompressed bytes to pass over at a time
+        buffers (int): the maximum number of blocks waiting to be parsed
+    """
+
+    def __init__(self, filename, block_size=4 * 1024 * 1024, buffers=8):
+        super().__init__()
+
+        self.filename = filename
+        self.block_size = block_size
+        self.compressed_bytes = os.path.getsize(filename)
+        self.decompressed_bytes = 0
+        self.decompress_seconds = 0.0
+        self.wait_seconds = 0.0
+
+        self._queue = queue.Queue(maxsize=buffers)
+        self._stop = threading.Event()
+        self._buffer = memoryview(b"")
+        self._offset = 0
+        self._finished = False
+
+        self._thread = threading.Thread(target=self._decompress, daemon=True)
+        self._thread.start()
+
+    def _open(self, stack):
+        # anything else that has to be closed along with the returned stream is added to the stack
+        extension = os.path.splitext(self.filename)[1]
+
+        if extension == ".gz":
+            return gzip.open(self.filename, "rb")
+        elif extension == ".bz2":
+            return bz2.open(self.filename, "rb")
+        elif extension == ".xz":
+            return lzma.open(self.filename, "rb")
+        elif extension == ".zip":
+            archive = stack.enter_context(zipfile.ZipFile(self.filename))
+            return archive.open(archive.namelist()[0])
+        elif extension == ".zst":
+            assert (
+                zstandard is not None
+            ), "zstandard must be installed to read .zst files"
+            return zstandard.ZstdDecompressor().stream_reader(open(self.filename, "rb"))
+        else:
+            return open(self.filename, "rb")
+
+    def _decompress(self):
+        try:
+            with contextlib.ExitStack() as stack:
+                INPUT = stack.enter_context(self._open(stack))
+                while not self._stop.is_set():
+                    start = time.perf_counter()
+                    block = INPUT.read(self.block_size)
+                    self.decompress_seconds += time.perf_counter() - start
+
+                    if not block:
+                        break
+
+                    self.decompressed_bytes += len(block)
+                    self._put(block)
+            self._put(None)
+        except Exception as error:
+            self._put(error)
+
+    def _put(self, item):
+        # give up if the reader has been closed, otherwise a full queue would block forever
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        # the current block is only ever read through an offset, so it is never copied except into b
+        while self._offset == len(self._buffer) and not self._finished:
+            start = time.perf_counter()
+            item = self._queue.get()
+            self.wait_seconds += time.perf_counter() - start
+
+            if item is None:
+                self._finished = True
+            elif isinstance(item, Exception):
+                self._finished = True
+                raise item
+            else:
+                self._buffer = memoryview(item)
+                self._offset = 0
+
+        n = min(len(b), len(self._buffer) - self._offset)
+        b[:n] = self._buffer[self._offset : self._offset + n]
+        self._offset += n
+        return n
+
+    def close(self):
+        self._stop.set()
+        super().close()
+
+
+def save_compressed_pickle(data, filename, threads=None, block_size=900 * 1024):
+    """Pickle data to filename, compressing with several threads where the format allows.
+
+    .bz2 files are written as a series of independently compressed streams, one per block, in parallel; this is
+    what pbzip2 does and the result is read by pandas.read_pickle and bz2.open as usual. .zst files use zstandard's
+    own multi-threaded compression. Anything else is left to pandas.to_pickle.
+
+    Returns the number of bytes pickled.
+    """
+
+    extension = os.path.splitext(filename)[1]
+
+    if extension == ".bz2":
+        payload = memoryview(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+        # only a few blocks are compressed ahead of the one being written, so memory stays bounded
+        max_in_flight = 2 * (threads or os.cpu_count() or 1)
+        in_flight = collections.deque()
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            with open(filename, "wb") as OUTPUT:
+                for i in range(0, len(payload), block_size):
+                    if len(in_flight) == max_in_flight:
+                        OUTPUT.write(in_flight.popleft().result())
+                    in_flight.append(
+                        executor.submit(bz2.compress, payload[i : i + block_size])
+                    )
+                while in_flight:
+                    OUTPUT.write(in_flight.popleft().result())
+
+        return len(payload)
+
+    elif extension == ".zst" and zstandard is not None:
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        compressor = zstandard.ZstdCompressor(
+            threads=-1 if threads is None else threads
+        )
+        with open(filename, "wb") as OUTPUT:
+            OUTPUT.write(compressor.compress(payload))
+        return len(payload)
+
+    else:
+        pandas.to_pickle(data, filename)
+        return os.path.getsize(filename)
@@ -0,0 +1,136 @@
+#! /usr/bin/env python
+
+import os, glob, hashlib, pickle
+
+
+class ResultCache(object):
+    """On-disk cache of derived tables, keyed by a fingerprint of the inputs that produced them.
+
+    Each entry is a pickle file named after the input file it was derived from and a hash of everything else the
+    result depends on, so entries for a changed input file are simply never hit again. The least recently used
+    entries are removed whenever the cache grows beyond max_bytes.
+
+    Args:
+        directory (str): where to keep the cache; created if it does not exist
+        max_bytes (int): the total size the cache is allowed to grow to
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._fingerprints = {}
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def fingerprint(self, filename):
+        """Return a fingerprint of a file made from its size, modification time and a hash of its contents."""
+
+        stat = os.stat(filename)
+        quick = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+
+        # only hash the contents once per file per session
+        if quick not in self._fingerprints:
+            content = hashlib.sha256()
+            with open(filename, "rb") as INPUT:
+                for block in iter(lambda: INPUT.read(1024 * 1024), b""):
+                    content.update(block)
+            self._fingerprints[quick] = (
+                stat.st_size,
+                stat.st_mtime_ns,
+                content.hexdigest(),
+            )
+
+        return self._fingerprints[quick]
+
+    def prefix(self, filename):
+        # entries are prefixed by the input path so that they can be invalidated per input file
+        return hashlib.sha256(os.path.abspath(filename).encode()).hexdigest()[:16]
+
+    def key(self, *parts):
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def _path(self, prefix, key):
+        return os.path.join(self.directory, prefix + "-" + key + ".pkl")
+
+    def load(self, prefix, key):
+        """Return (True, value) if the entry exists, otherwise (False, None)."""
+
+        path = self._path(prefix, key)
+
+        try:
+            with open(path, "rb") as INPUT:
+                value = pickle.load(INPUT)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return (False, None)
+
+        # touch the file so that eviction removes the least recently used entries first
+        os.utime(path)
+
+        return (True, value)
+
+    def save(self, prefix, key, value):
+        """Store value, unless it is larger than max_bytes. Returns whether the entry was kept."""
+
+        path = self._path(prefix, key)
+
+        # write to a temporary file first so an interrupted run never leaves a truncated entry
+        with open(path + ".tmp", "wb") as OUTPUT:
+            pickle.dump(value, OUTPUT, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # an entry bigger than the whole cache would only be evicted straight away, taking everything else with it
+        if os.path.getsize(path + ".tmp") > self.max_bytes:
+            os.remove(path + ".tmp")
+            return False
+
+        os.replace(path + ".tmp", path)
+
+        self.evict()
+
+        return True
+
+    def _entries(self, prefix=None):
+        if prefix is None:
+            pattern = "*.pkl"
+        else:
+            pattern = prefix + "-*.pkl"
+        return glob.glob(os.path.join(self.directory, pattern))
+
+    def size(self):
+        return sum(os.path.getsize(i) for i in self._entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is no larger than max_bytes."""
+
+        entries = sorted(
+            ((os.stat(i).st_mtime_ns, os.path.getsize(i), i) for i in self._entries()),
+            reverse=True,
+        )
+
+        total = sum(size for _, size, _ in entries)
+
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop()
+            os.remove(path)
+            total -= size
+
+    def invalidate(self, filename=None):
+        """Remove every entry derived from filename, or the whole cache if no filename is given.
+
+        Returns the number of entries removed.
+        """
+
+        if filename is None:
+            entries = self._entries()
+        else:
+            entries = self._entries(self.prefix(filename))
+
+        for path in entries:
+            os.remove(path)
+
+        return len(entries)
+
+    def __repr__(self):
+        line = "%30s %s\n" % ("Cache directory:", self.directory)
+        line += "%30s %7i\n" % ("Cached results:", len(self._entries()))
+        line += "%30s %7.1f MB\n" % ("Cache size:", self.size() / 1024**2)
+        return line
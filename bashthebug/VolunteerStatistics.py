@@ -0,0 +1,203 @@
+#! /usr/bin/env python
+
+import pandas, numpy
+
+from . import engines
+
+
+class VolunteerStatistics(object):
+    """Running per-volunteer statistics on how their classifications compare with the consensus.
+
+    Only the sufficient statistics are kept, one row per volunteer in a pair of numpy arrays, so that new
+    classifications can be added with update() without going back to the full CLASSIFICATIONS table, and two sets
+    of statistics on different classifications (e.g. regular and pro) can be combined with merge(). The rates are calculated when
+    asked for by to_frame().
+
+    A classification is compared with the consensus when both it and the bashthebug_median of its image are valid
+    dilutions; exact agreement means median_delta is zero and essential agreement that it is within one dilution.
+    """
+
+    COUNTS = [
+        "regular",
+        "pro",
+        "cannot_read",
+        "failed",
+        "compared",
+        "exact",
+        "essential",
+    ]
+
+    SUMS = ["delta", "absolute_delta"]
+
+    def __init__(self):
+        self.users = numpy.array([], dtype=str)
+        self.counts = numpy.zeros((0, len(self.COUNTS)), dtype=numpy.int32)
+        self.sums = numpy.zeros((0, len(self.SUMS)), dtype=numpy.float64)
+        # the most recent classification added of each flavour
+        self.last_created_at = {}
+
+    def _rows(self, users):
+        # find the row of each user, adding rows for any that have not been seen before
+        rows = pandas.Index(self.users).get_indexer(users)
+        new = numpy.asarray(users)[rows < 0]
+
+        if len(new) > 0:
+            rows[rows < 0] = numpy.arange(len(self.users), len(self.users) + len(new))
+            self.users = numpy.concatenate([self.users, new.astype(str)])
+            self.counts = numpy.vstack(
+                [
+                    self.counts,
+                    numpy.zeros((len(new), len(self.COUNTS)), dtype=numpy.int32),
+                ]
+            )
+            self.sums = numpy.vstack(
+                [self.sums, numpy.zeros((len(new), len(self.SUMS)))]
+            )
+
+        return rows
+
+    def update(self, classifications, flavour):
+        """Add classifications that have not been seen before.
+
+        Classifications made at or before last_created_at[flavour] are assumed to have been added already and are
+        skipped, so overlapping exports can be fed in as they arrive. Each classification is compared with the
+        bashthebug_median it has when it is added; the statistics are not revised if the consensus later changes.
+
+        Args:
+            classifications (pandas.DataFrame): needs user_name, bashthebug_dilution, bashthebug_median and
+            median_delta, i.e. after calculate_consensus_median()
+            flavour (str): regular or pro
+        """
+
+        for column in [
+            "user_name",
+            "bashthebug_dilution",
+            "bashthebug_median",
+            "median_delta",
+        ]:
+            assert column in classifications.columns, (
+                column
+                + " not in CLASSIFICATIONS table; run calculate_consensus_median() first!"
+            )
+
+        if "created_at" in classifications.columns:
+            latest = classifications["created_at"].max()
+            if flavour in self.last_created_at:
+                classifications = classifications.loc[
+                    classifications["created_at"] > self.last_created_at[flavour]
+                ]
+        else:
+            latest = None
+
+        failed, cannot_read_from, cannot_read_to, _, _ = engines.flavour_rules(flavour)
+
+        dilution = classifications["bashthebug_dilution"]
+        delta = classifications["median_delta"]
+        compared = (dilution > 0) & (classifications["bashthebug_median"] > 0)
+
+        table = pandas.DataFrame(
+            {
+                "user_name": classifications["user_name"],
+                "regular": int(flavour == "regular"),
+                "pro": int(flavour == "pro"),
+                "cannot_read": (dilution >= cannot_read_from)
+                & (dilution <= cannot_read_to),
+                "failed": dilution < failed,
+                "compared": compared,
+                "exact": compared & (delta == 0),
+                "essential": compared & (delta.abs() <= 1),
+                "delta": delta.where(compared, 0),
+                "absolute_delta": delta.abs().where(compared, 0),
+            }
+        )
+
+        totals = table.groupby("user_name").sum()
+
+        rows = self._rows(totals.index)
+        self.counts[rows] += totals[self.COUNTS].to_numpy(dtype=numpy.int32)
+        self.sums[rows] += totals[self.SUMS].to_numpy(dtype=numpy.float64)
+
+        if latest is not None and not pandas.isna(latest):
+            if (
+                flavour not in self.last_created_at
+                or latest > self.last_created_at[flavour]
+            ):
+                self.last_created_at[flavour] = latest
+
+        return self
+
+    def merge(self, other):
+        """Add the statistics of another VolunteerStatistics to these ones."""
+
+        rows = self._rows(other.users)
+        self.counts[rows] += other.counts
+        self.sums[rows] += other.sums
+
+        for flavour, latest in other.last_created_at.items():
+            if (
+                flavour not in self.last_created_at
+                or latest > self.last_created_at[flavour]
+            ):
+                self.last_created_at[flavour] = latest
+
+        return self
+
+    def to_frame(self):
+        """Return a table with one row per volunteer of their counts and rates."""
+
+        table = pandas.DataFrame(
+            self.counts,
+            index=pandas.Index(self.users, name="user_name"),
+            columns=self.COUNTS,
+        )
+
+        table.insert(0, "classifications", table["regular"] + table["pro"])
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            table["cannot_read_rate"] = table["cannot_read"] / table["classifications"]
+            table["failed_rate"] = table["failed"] / table["classifications"]
+            table["mean_delta"] = self.sums[:, 0] / table["compared"]
+            table["mean_absolute_delta"] = self.sums[:, 1] / table["compared"]
+            table["exact_agreement"] = table["exact"] / table["compared"]
+            table["essential_agreement"] = table["essential"] / table["compared"]
+
+        return table
+
+    def rank(self, by="essential_agreement", min_classifications=50, ascending=False):
+        """Return the volunteers with at least min_classifications compared with the consensus, sorted by a column of to_frame()."""
+
+        table = self.to_frame()
+        table = table.loc[table["compared"] >= min_classifications]
+        return table.sort_values(by, ascending=ascending)
+
+    def save(self, filename):
+        numpy.savez_compressed(
+            filename,
+            users=self.users,
+            counts=self.counts,
+            sums=self.sums,
+            flavours=numpy.array(list(self.last_created_at), dtype=str),
+            last_created_at=numpy.array(
+                [str(i) for i in self.last_created_at.values()], dtype=str
+            ),
+        )
+
+    @classmethod
+    def load(cls, filename):
+        statistics = cls()
+
+        with numpy.load(filename) as contents:
+            statistics.users = contents["users"]
+            statistics.counts = contents["counts"]
+            statistics.sums = contents["sums"]
+            statistics.last_created_at = {
+                str(flavour): pandas.Timestamp(str(latest))
+                for flavour, latest in zip(
+                    contents["flavours"], contents["last_created_at"]
+                )
+            }
+
+        return statistics
+
+    def __len__(self):
+        return len(self.users)
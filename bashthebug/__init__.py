@@ -1,3 +1,10 @@
 #! /usr/bin/env python
 
+__version__ = "0.1.0"
+
 from .BashTheBugClassifications import BashTheBugClassifications    
+from .ParseErrors import ParseErrors
+from .ResultCache import ResultCache
+from .DawidSkene import DawidSkene
+from .PartialAggregates import PartialAggregates
+from .VolunteerStatistics import VolunteerStatistics
@@ -0,0 +1,337 @@
+#! /usr/bin/env python
+
+import math
+
+import pandas, numpy
+
+# the columnar engines are optional; pandas is always available as the fallback
+try:
+    import polars
+except ImportError:
+    polars = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+ENGINES = ["polars", "duckdb", "pandas"]
+
+
+def available_engines():
+    """Return the dataframe engines that can be used, fastest first."""
+
+    engines = []
+    if polars is not None:
+        engines.append("polars")
+    if duckdb is not None:
+        engines.append("duckdb")
+    engines.append("pandas")
+    return engines
+
+
+def resolve_engine(engine=None):
+    """Work out which engine to use.
+
+    Args:
+        engine (str): one of polars, duckdb, pandas or auto. If None or auto, the fastest installed engine is chosen.
+    """
+
+    if engine is None or engine == "auto":
+        return available_engines()[0]
+
+    assert engine in ENGINES, "engine not recognised! " + engine
+    assert engine in available_engines(), engine + " is not installed!"
+
+    return engine
+
+
+def flavour_rules(flavour):
+    """Return how a flavour's dilution codes are interpreted, as used by _custom_aggregate_classifications.
+
+    Returns:
+        (failed below, cannot read from, cannot read to, classifications threshold, valid threshold)
+    """
+
+    if flavour == "regular":
+        return (-2, -2, -1, 11, 6)
+    elif flavour == "pro":
+        return (-20, -19, -2, 2, 2)
+    raise ValueError("flavour not recognised! " + str(flavour))
+
+
+def _prepare(classifications, keys, columns):
+    # pandas groupby silently drops groups with missing keys, so the engines must too
+    table = classifications[keys + columns].dropna(subset=keys)
+    return table.reset_index(drop=True)
+
+
+def _to_polars(table):
+    # go via numpy so that polars does not need pyarrow to read pandas extension dtypes; missing
+    # values then arrive as NaN, which polars would otherwise treat as a number rather than as null
+    return polars.DataFrame(
+        {column: table[column].to_numpy() for column in table.columns},
+        nan_to_null=True,
+    )
+
+
+def _from_polars(df):
+    return pandas.DataFrame({column: df[column].to_numpy() for column in df.columns})
+
+
+def _polars_summary(table, keys, flavour):
+    failed, cannot_read_from, cannot_read_to, _, _ = flavour_rules(flavour)
+
+    df = _to_polars(table).with_columns(
+        polars.col("bashthebug_dilution").cast(polars.Int64).alias("d")
+    )
+    d = polars.col("d")
+    valid = d.filter(d >= 1)
+
+    summary = df.group_by(keys).agg(
+        polars.len().alias("count"),
+        (d < failed).sum().alias("n_failed"),
+        ((d >= cannot_read_from) & (d <= cannot_read_to)).sum().alias("n_cannot_read"),
+        (d > 0).sum().alias("n_valid"),
+        (d >= -20).sum().alias("n_kept"),
+        valid.median().alias("v_median"),
+        valid.mean().alias("v_mean"),
+        valid.std(ddof=0).alias("v_std"),
+        valid.min().alias("v_min"),
+        valid.max().alias("v_max"),
+    )
+
+    votes = df.filter(d >= 1).group_by(keys + ["d"]).agg(polars.len().alias("n"))
+    modes = (
+        votes.with_columns(polars.col("n").max().over(keys).alias("max_n"))
+        .filter(polars.col("n") == polars.col("max_n"))
+        .group_by(keys)
+        .agg(
+            polars.col("n").max().alias("mode_votes"),
+            polars.len().alias("mode_ties"),
+            polars.col("d").min().alias("mode_value"),
+        )
+    )
+
+    return _from_polars(summary.join(modes, on=keys, how="left"))
+
+
+def _duckdb_summary(table, keys, flavour):
+    failed, cannot_read_from, cannot_read_to, _, _ = flavour_rules(flavour)
+
+    groups = ", ".join('"' + key + '"' for key in keys)
+
+    connection = duckdb.connect()
+    connection.register("classifications", table)
+
+    summary = connection.execute(f"""
+        SELECT {groups},
+            count(*) AS count,
+            count(*) FILTER (WHERE d < {failed}) AS n_failed,
+            count(*) FILTER (WHERE d BETWEEN {cannot_read_from} AND {cannot_read_to}) AS n_cannot_read,
+            count(*) FILTER (WHERE d > 0) AS n_valid,
+            count(*) FILTER (WHERE d >= -20) AS n_kept,
+            quantile_cont(d, 0.5) FILTER (WHERE d >= 1) AS v_median,
+            avg(d) FILTER (WHERE d >= 1) AS v_mean,
+            stddev_pop(d) FILTER (WHERE d >= 1) AS v_std,
+            min(d) FILTER (WHERE d >= 1) AS v_min,
+            max(d) FILTER (WHERE d >= 1) AS v_max
+        FROM (SELECT *, CAST(bashthebug_dilution AS BIGINT) AS d FROM classifications)
+        GROUP BY {groups}
+        """).df()
+
+    modes = connection.execute(f"""
+        WITH votes AS (
+            SELECT {groups}, CAST(bashthebug_dilution AS BIGINT) AS d, count(*) AS n
+            FROM classifications
+            WHERE bashthebug_dilution >= 1
+            GROUP BY ALL
+        ),
+        ranked AS (
+            SELECT *, max(n) OVER (PARTITION BY {groups}) AS max_n FROM votes
+        )
+        SELECT {groups},
+            max(n) AS mode_votes,
+            count(*) AS mode_ties,
+            min(d) AS mode_value
+        FROM ranked
+        WHERE n = max_n
+        GROUP BY {groups}
+        """).df()
+
+    connection.close()
+
+    return pandas.merge(summary, modes, on=keys, how="left")
+
+
+def _finalise_measurements(summary, keys, flavour):
+    # apply the per-group consensus rules to the vectorised summary statistics; this is
+    # the same decision tree as BashTheBugClassifications._custom_aggregate_classifications
+    _, _, _, classifications_threshold, valid_threshold = flavour_rules(flavour)
+
+    summary = summary.sort_values(keys)
+
+    count = summary["count"].to_numpy(dtype=int)
+    n_valid = summary["n_valid"].to_numpy(dtype=int)
+    n_cannot_read = summary["n_cannot_read"].to_numpy(dtype=int)
+    n_kept = summary["n_kept"].to_numpy(dtype=int)
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        proportion_failed = n_cannot_read / n_kept
+
+    enough = count >= classifications_threshold
+    cannot_read = enough & ((proportion_failed >= 0.5) | (n_valid < valid_threshold))
+    measured = enough & ~cannot_read
+
+    median = [None] * len(summary)
+    mean = [None] * len(summary)
+    std = [None] * len(summary)
+    mmin = [None] * len(summary)
+    mmax = [None] * len(summary)
+
+    if flavour == "regular":
+        columns = [
+            summary[i].to_numpy()
+            for i in ["v_median", "v_mean", "v_std", "v_min", "v_max"]
+        ]
+        for row in numpy.flatnonzero(measured):
+            median[row] = math.ceil(columns[0][row])
+            mean[row] = float(columns[1][row])
+            std[row] = float(columns[2][row])
+            mmin[row] = int(columns[3][row])
+            mmax[row] = int(columns[4][row])
+    else:
+        mode_value = summary["mode_value"].to_numpy(dtype=float)
+        mode_votes = summary["mode_votes"].to_numpy(dtype=float)
+        mode_ties = summary["mode_ties"].to_numpy(dtype=float)
+        for row in numpy.flatnonzero(measured):
+            if mode_ties[row] == 1 and mode_votes[row] > 1:
+                median[row] = int(mode_value[row])
+            else:
+                median[row] = -1
+
+    for row in numpy.flatnonzero(cannot_read):
+        median[row] = -1
+
+    index = pandas.MultiIndex.from_frame(summary[keys])
+
+    return pandas.DataFrame(
+        {
+            0: count.tolist(),
+            1: summary["n_failed"].to_numpy(dtype=int).tolist(),
+            2: n_cannot_read.tolist(),
+            3: n_valid.tolist(),
+            4: median,
+            5: mean,
+            6: std,
+            7: mmin,
+            8: mmax,
+        },
+        index=index,
+    )
+
+
+def aggregate_measurements(classifications, keys, flavour, engine):
+    """Build the raw measurements table using a columnar engine.
+
+    Returns a pandas dataframe indexed by keys with the same nine columns, in the same order,
+    as the tuples returned by BashTheBugClassifications._custom_aggregate_classifications.
+    """
+
+    table = _prepare(classifications, keys, ["bashthebug_dilution"])
+
+    if engine == "polars":
+        summary = _polars_summary(table, keys, flavour)
+    elif engine == "duckdb":
+        summary = _duckdb_summary(table, keys, flavour)
+    else:
+        raise ValueError("no vectorised measurements for engine " + engine)
+
+    return _finalise_measurements(summary, keys, flavour)
+
+
+def aggregate_durations(classifications, keys, statistics, engine):
+    """Summarise task_duration per group, returning a pandas dataframe with ('task_duration', statistic) columns."""
+
+    table = _prepare(classifications, keys, ["task_duration"])
+    table["task_duration"] = table["task_duration"].astype(float)
+
+    if engine == "polars":
+        t = polars.col("task_duration")
+        expressions = {
+            "median": t.median(),
+            "mean": t.mean(),
+            "std": t.std(ddof=1),
+            "min": t.min(),
+            "max": t.max(),
+            "count": t.count(),
+        }
+        durations = _from_polars(
+            _to_polars(table)
+            .group_by(keys)
+            .agg([expressions[i].alias(i) for i in statistics])
+        )
+
+    elif engine == "duckdb":
+        expressions = {
+            "median": "quantile_cont(task_duration, 0.5)",
+            "mean": "avg(task_duration)",
+            "std": "stddev_samp(task_duration)",
+            "min": "min(task_duration)",
+            "max": "max(task_duration)",
+            "count": "count(task_duration)",
+        }
+        groups = ", ".join('"' + key + '"' for key in keys)
+        connection = duckdb.connect()
+        connection.register("classifications", table)
+        durations = connection.execute(
+            "SELECT "
+            + groups
+            + ", "
+            + ", ".join(expressions[i] + ' AS "' + i + '"' for i in statistics)
+            + " FROM classifications GROUP BY "
+            + groups
+        ).df()
+        connection.close()
+
+    else:
+        raise ValueError("no vectorised durations for engine " + engine)
+
+    # polars counts are unsigned 32-bit integers, whereas pandas returns int64
+    if "count" in statistics:
+        durations["count"] = durations["count"].astype("int64")
+
+    durations = durations.sort_values(keys).set_index(keys)[statistics]
+    durations.columns = pandas.MultiIndex.from_product([["task_duration"], statistics])
+
+    return durations
+
+
+def consensus_median(classifications, engine):
+    """Return the median bashthebug_dilution for each filename as a pandas dataframe indexed by filename."""
+
+    table = _prepare(classifications, ["filename"], ["bashthebug_dilution"])
+
+    if engine == "polars":
+        consensus = _from_polars(
+            _to_polars(table)
+            .group_by("filename")
+            .agg(polars.col("bashthebug_dilution").median())
+        )
+
+    elif engine == "duckdb":
+        connection = duckdb.connect()
+        connection.register("classifications", table)
+        consensus = connection.execute(
+            "SELECT filename, quantile_cont(bashthebug_dilution, 0.5) AS bashthebug_dilution FROM classifications GROUP BY filename"
+        ).df()
+        connection.close()
+
+    else:
+        raise ValueError("no vectorised consensus for engine " + engine)
+
+    consensus = consensus.sort_values("filename").set_index("filename")
+    consensus["bashthebug_dilution"] = consensus["bashthebug_dilution"].astype(float)
+
+    return consensus
@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+
+import re
+
+import pandas, numpy
+
+# a plate_image is the plate, the reading day and, for the newer plate designs, a -UKMYCn suffix
+# e.g. CRY-1234-03-1-2-14, H37rV-04-2-1-7, 01-0123-4567-abc-14 or 01-0123-4567-abc-14-UKMYC6
+PLATE_IMAGE = re.compile(
+    r"^(?P<plate>.+)-(?!UKMYC)(?P<reading_day>[^-]+)(?:-(?P<plate_design>UKMYC[^-]*))?$"
+)
+
+# CRyPTIC1 plates are named strain-site-replicate-reader, where the strain may itself contain hyphens
+CRYPTIC1_PLATE = re.compile(
+    r"^(?P<strain>.+)-(?P<site>[^-]+)-(?P<replicate>[^-]+)-(?P<reader>[^-]+)$"
+)
+
+CRYPTIC1_PREFIXES = ("H37", "CRY")
+
+COLUMNS = [
+    "study_id",
+    "strain",
+    "site",
+    "replicate",
+    "reader",
+    "reading_day",
+    "plate",
+    "plate_design",
+]
+
+INTEGERS = ["replicate", "reader", "reading_day"]
+
+
+def determine_study(name):
+    """Return CRyPTIC1, CRyPTIC2 or None from a filename or plate_image."""
+
+    if not isinstance(name, str):
+        return None
+    elif name[:3] in CRYPTIC1_PREFIXES:
+        return "CRyPTIC1"
+    else:
+        return "CRyPTIC2"
+
+
+def parse_plate_images(plate_images):
+    """Split plate_image names into their fields.
+
+    Each distinct name is only parsed once. reading_day, replicate and reader are nullable integers and are missing
+    where the name does not fit the grammar (replicate and reader are only defined for CRyPTIC1); plate_design is only
+    set when the name ends in a UKMYC suffix.
+
+    Args:
+        plate_images (array): plate_image names, may contain None
+
+    Returns:
+        pandas.DataFrame with COLUMNS, indexed by the distinct plate_images
+    """
+
+    names = pandas.Series(
+        pandas.unique(pandas.Series(plate_images).dropna()), dtype=object
+    )
+
+    table = names.str.extract(PLATE_IMAGE)
+    table.index = pandas.Index(names, name="plate_image")
+
+    table["study_id"] = [determine_study(i) for i in names]
+    cryptic1 = table["study_id"] == "CRyPTIC1"
+
+    # only CRyPTIC1 plates have the strain, replicate and reader in their name
+    fields = table["plate"].where(cryptic1).astype(object).str.extract(CRYPTIC1_PLATE)
+    table["strain"] = fields["strain"]
+    table["site"] = fields["site"].where(cryptic1, names.str[:2].to_numpy())
+
+    table["replicate"] = fields["replicate"]
+    table["reader"] = fields["reader"]
+    for column in INTEGERS:
+        table[column] = pandas.to_numeric(table[column], errors="coerce").astype(
+            "Int64"
+        )
+
+    return table[COLUMNS]
+
+
+def _integer(value):
+    # the same as pandas.to_numeric(errors="coerce") for the fields a name can contain
+    return (
+        int(value)
+        if value is not None and value.isascii() and value.isdigit()
+        else None
+    )
+
+
+def parse_plate_image(plate_image):
+    """Return the fields of a single plate_image as a dict; see parse_plate_images().
+
+    This applies the same regular expressions directly, since building a table for each name is slow.
+    """
+
+    fields = dict.fromkeys(COLUMNS)
+    fields["study_id"] = determine_study(plate_image)
+
+    match = PLATE_IMAGE.match(plate_image)
+    if match is not None:
+        fields.update(match.groupdict())
+
+    if fields["study_id"] == "CRyPTIC1":
+        match = CRYPTIC1_PLATE.match(fields["plate"]) if fields["plate"] else None
+        if match is not None:
+            fields.update(match.groupdict())
+    else:
+        fields["site"] = plate_image[:2]
+
+    for i in INTEGERS:
+        fields[i] = _integer(fields[i])
+
+    return fields
+
+
+def parse_filenames(filenames, flavour):
+    """Split Zooniverse subject filenames (without their extension) into their fields.
+
+    The filename is the plate_image, an optional UKMYC plate design, then -zooniverse- (regular) or -discrepancy-
+    (pro) and finally the drug. Where there is no design in the filename the plate is a UKMYC5.
+
+    Returns:
+        pandas.DataFrame with plate_image, plate_design, drug, plate, study_id, reading_day and site, indexed by the
+        distinct filenames
+    """
+
+    assert flavour in ["regular", "pro"], "flavour not recognised! " + flavour
+
+    marker = "-zooniverse" if flavour == "regular" else "-discrepancy"
+
+    names = pandas.Series(
+        pandas.unique(pandas.Series(filenames).dropna()), dtype=object
+    )
+
+    design = names.str.contains("UKMYC", regex=False)
+    ukmyc = names.str.split("-UKMYC", n=1, regex=False)
+
+    table = pandas.DataFrame(index=pandas.Index(names, name="filename"))
+    table["plate_image"] = numpy.where(
+        design, ukmyc.str[0], names.str.split(marker + "-", regex=False).str[0]
+    )
+    table["plate_design"] = numpy.where(
+        design,
+        "UKMYC" + ukmyc.str[1].astype(object).str.split(marker, regex=False).str[0],
+        "UKMYC5",
+    )
+    table["drug"] = names.str[-3:].to_numpy()
+
+    fields = parse_plate_images(table["plate_image"]).reindex(table["plate_image"])
+    for column in ["plate", "study_id", "reading_day", "site"]:
+        table[column] = fields[column].to_numpy()
+
+    return table
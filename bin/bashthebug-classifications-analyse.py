@@ -1,6 +1,6 @@
 #! /usr/bin/env python
 
-import argparse, logging
+import argparse, logging, sys
 
 import pandas
 
@@ -33,6 +33,64 @@ if __name__ == "__main__":
         type=str,
         help="whether to create a regular BASHTHEBUG table or final BASHTHEBUGPRO table (regular/pro)",
     )
+    parser.add_argument(
+        "--engine",
+        default="auto",
+        choices=["auto", "polars", "duckdb", "pandas"],
+        help="which dataframe engine to use for the aggregations; auto picks the fastest one installed",
+    )
+    parser.add_argument(
+        "--sqlite",
+        required=False,
+        help="also write the decoded classifications to this indexed SQLite database for ad-hoc queries",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        default=False,
+        help="stop at the first classification that cannot be parsed",
+    )
+    parser.add_argument(
+        "--cache",
+        required=False,
+        help="directory in which to cache derived tables so that re-running on the same export is fast",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=2,
+        help="the size in GB the cache can grow to before the least recently used tables are removed",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        default=False,
+        help="remove any cached tables derived from the input file before running",
+    )
+    parser.add_argument(
+        "--shard",
+        required=False,
+        help="only process one shard of the subjects, given as i/n e.g. 0/8, so a run can be split across jobs",
+    )
+    parser.add_argument(
+        "--partial",
+        required=False,
+        help="save mergeable partial aggregates to this file and stop; combine them with bashthebug-partials-merge.py. "
+        "These are grouped by plate_image and drug and are a fixed-size summary; partials grouped by PLATE (see "
+        "save_partial_aggregates) also keep every task_duration so that the median can be merged",
+    )
+    parser.add_argument(
+        "--sample-fraction",
+        type=float,
+        required=False,
+        help="for a quick look, only decode this fraction of the subjects, stratified by study, site and drug",
+    )
+    parser.add_argument(
+        "--sample-seed",
+        type=int,
+        default=0,
+        help="change to draw a different sample when using --sample-fraction",
+    )
     options = parser.parse_args()
 
     assert options.flavour in ["regular", "pro"], "unrecognised flavour of BashTheBug!"
@@ -47,62 +105,38 @@ if __name__ == "__main__":
             ".csv"
         )[0]
 
+    if options.clear_cache:
+        assert options.cache, "--clear-cache needs the --cache directory to be given"
+        removed = bashthebug.ResultCache(
+            options.cache, max_bytes=int(options.cache_size * 1024**3)
+        ).invalidate(options.input)
+        print("Removed " + str(removed) + " cached tables")
+
     print("Reading classifications from CSV file...")
 
+    # build up the arguments once rather than for every combination of options
+    kwargs = {"zooniverse_file": options.input, "flavour": options.flavour}
     if options.to_date:
-        if options.from_date:
-            if options.flavour == "pro":
-                current_classifications = bashthebug.BashTheBugClassifications(
-                    zooniverse_file=options.input,
-                    to_date=options.to_date,
-                    from_date=options.from_date,
-                    live_rows=False,
-                    flavour=options.flavour,
-                )
-            else:
-                current_classifications = bashthebug.BashTheBugClassifications(
-                    zooniverse_file=options.input,
-                    to_date=options.to_date,
-                    from_date=options.from_date,
-                    flavour=options.flavour,
-                )
-        else:
-            if options.flavour == "pro":
-                current_classifications = bashthebug.BashTheBugClassifications(
-                    zooniverse_file=options.input,
-                    to_date=options.to_date,
-                    live_rows=False,
-                    flavour=options.flavour,
-                )
-            else:
-                current_classifications = bashthebug.BashTheBugClassifications(
-                    zooniverse_file=options.input,
-                    to_date=options.to_date,
-                    flavour=options.flavour,
-                )
-    elif options.from_date:
-        if options.flavour == "pro":
-            current_classifications = bashthebug.BashTheBugClassifications(
-                zooniverse_file=options.input,
-                from_date=options.from_date,
-                live_rows=False,
-                flavour=options.flavour,
-            )
-        else:
-            current_classifications = bashthebug.BashTheBugClassifications(
-                zooniverse_file=options.input,
-                from_date=options.from_date,
-                flavour=options.flavour,
-            )
-    else:
-        if options.flavour == "pro":
-            current_classifications = bashthebug.BashTheBugClassifications(
-                zooniverse_file=options.input, live_rows=False, flavour=options.flavour
-            )
-        else:
-            current_classifications = bashthebug.BashTheBugClassifications(
-                zooniverse_file=options.input, flavour=options.flavour
-            )
+        kwargs["to_date"] = options.to_date
+    if options.from_date:
+        kwargs["from_date"] = options.from_date
+    if options.flavour == "pro":
+        kwargs["live_rows"] = False
+    if options.sample_fraction:
+        kwargs["sample_fraction"] = options.sample_fraction
+        kwargs["sample_seed"] = options.sample_seed
+
+    current_classifications = bashthebug.BashTheBugClassifications(
+        engine=options.engine,
+        strict=options.strict,
+        cache_dir=options.cache,
+        cache_max_bytes=int(options.cache_size * 1024**3),
+        **kwargs
+    )
+
+    if options.shard:
+        shard, n_shards = (int(i) for i in options.shard.split("/"))
+        current_classifications.select_shard(shard, n_shards)
 
     current_classifications.extract_classifications()
 
@@ -130,8 +164,33 @@ if __name__ == "__main__":
             datefmt="%a %d %b %Y %H:%M:%S",
         )
 
+    # now the log file exists, record everything that could not be parsed in one go
+    current_classifications.parse_errors.log()
+
+    if current_classifications.parse_errors.total > 0:
+        print(
+            str(current_classifications.parse_errors.total)
+            + " classifications could not be parsed; see the log file for details"
+        )
+
+    if current_classifications.parse_errors.expected > 0:
+        print(
+            str(current_classifications.parse_errors.expected)
+            + " classifications from the testing task were skipped"
+        )
+
+    if options.partial:
+        print("Saving partial aggregates...")
+        current_classifications.save_partial_aggregates(options.partial)
+        sys.exit(0)
+
     current_classifications.create_measurements_table()
 
+    if options.sample_fraction:
+        summary = current_classifications.sample_summary()
+        print(summary)
+        logging.info(summary)
+
     current_classifications.create_users_table()
 
     for sampling_time in ["month", "week", "day"]:
@@ -180,3 +239,10 @@ if __name__ == "__main__":
         )
 
     logging.info(current_classifications.users[["classifications", "rank"]][:20])
+
+    if options.timings:
+        print(current_classifications.throughput())
+
+    if options.sqlite:
+        print("Saving SQLite database...")
+        current_classifications.save_sqlite(options.sqlite)
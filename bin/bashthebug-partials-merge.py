@@ -0,0 +1,41 @@
+#! /usr/bin/env python
+
+import argparse
+
+import bashthebug
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--flavour",
+        default="regular",
+        type=str,
+        help="whether the partial aggregates are from BASHTHEBUG or BASHTHEBUGPRO (regular/pro)",
+    )
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="the pickle file to write the MEASUREMENTS table to (e.g. dat/bash-the-bug-measurements.pkl.bz2)",
+    )
+    parser.add_argument(
+        "partials",
+        nargs="+",
+        help="the partial aggregate files written by bashthebug-classifications-analyse.py --partial",
+    )
+    options = parser.parse_args()
+
+    assert options.flavour in ["regular", "pro"], "unrecognised flavour of BashTheBug!"
+
+    print("Merging " + str(len(options.partials)) + " partial aggregates...")
+
+    merged = bashthebug.BashTheBugClassifications(flavour=options.flavour)
+    merged.load_partial_aggregates(options.partials)
+
+    merged.measurements.to_pickle(options.output)
+
+    # the durations are only there if the task durations were calculated in every job
+    if hasattr(merged, "durations"):
+        stem = options.output.split(".pkl")[0]
+        merged.durations.to_pickle(
+            stem + "-durations.pkl" + options.output.split(".pkl")[1]
+        )
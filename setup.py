@@ -7,12 +7,20 @@ setup(
         "ujson >= 1.35",
         "matplotlib >= 2.1.1",
     ],
+    extras_require={
+        "polars": ["polars >= 0.20"],
+        "duckdb": ["duckdb >= 0.9"],
+        "zstd": ["zstandard >= 0.15"],
+    },
     name="bashthebug",
     version="0.1.0",
     url="https://github.com/philipwfowler/bashthebug",
     author="Philip W Fowler",
     packages=["bashthebug"],
     license="MIT",
-    scripts=["bin/bashthebug-classifications-analyse.py"],
+    scripts=[
+        "bin/bashthebug-classifications-analyse.py",
+        "bin/bashthebug-partials-merge.py",
+    ],
     long_description=open("README.md").read(),
 )
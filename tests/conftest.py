@@ -0,0 +1,19 @@
+import pytest
+
+from .helpers import write_export
+
+
+@pytest.fixture(params=["regular", "pro"])
+def flavour(request):
+    return request.param
+
+
+@pytest.fixture
+def export(tmp_path, flavour):
+    return write_export(tmp_path / "export.csv", flavour=flavour)
+
+
+@pytest.fixture
+def bad_export(tmp_path, flavour):
+    # a few subjects whose subject_data does not contain their own subject_id
+    return write_export(tmp_path / "export.csv", flavour=flavour, bad_subjects=3)
@@ -0,0 +1,160 @@
+"""Synthetic Zooniverse exports shared by the tests."""
+
+import csv, json, random, datetime
+
+import bashthebug
+
+DRUGS = ["BDQ", "INH", "RIF", "EMB"]
+
+TASK_LABELS = {
+    "regular": "Having looked at the wells, which is the first well with no growth?",
+    "pro": "Please, being mindful of the existing classification results, choose the MIC",
+}
+
+MARKERS = {"regular": "-zooniverse-", "pro": "-discrepancy-"}
+
+
+def plate_image_name(rng, study):
+    """Return a random plate_image (without any UKMYC suffix) for CRyPTIC1 or CRyPTIC2."""
+
+    day = str(rng.choice([7, 10, 14, 21]))
+    if study == "CRyPTIC1":
+        strain = rng.choice(["CRY-%04i" % rng.randint(1, 9999), "H37rV", "H37Rv-a"])
+        return "-".join(
+            [
+                strain,
+                "%02i" % rng.randint(1, 20),
+                str(rng.randint(1, 3)),
+                str(rng.randint(1, 2)),
+                day,
+            ]
+        )
+    else:
+        return "%02i-%04i-%07i-%s-%s" % (
+            rng.randint(1, 20),
+            rng.randint(0, 9999),
+            rng.randint(0, 10**7),
+            rng.choice(["ab", "1"]),
+            day,
+        )
+
+
+def _annotations(rng, flavour):
+    answer = rng.choice(
+        ["dilution"] * 6 + ["Cannot classify", "No Growth in all", "Growth in all"]
+    )
+
+    annotations = [
+        {
+            "task": "T0",
+            "task_label": TASK_LABELS[flavour],
+            "value": "Some growth" if answer == "dilution" else answer,
+        }
+    ]
+
+    if answer == "dilution":
+        annotations.append({"task": "T1", "value": str(rng.randint(1, 7))})
+    elif answer == "Cannot classify":
+        # only BashTheBugPro asks why
+        annotations.append(
+            {"task": "T2", "value": rng.choice(["Skip wells", "Artefacts"])}
+        )
+
+    return annotations
+
+
+def write_export(
+    filename,
+    flavour="regular",
+    n_subjects=40,
+    classifications_per_subject=15,
+    shared_groups=0,
+    bad_subjects=0,
+    seed=0,
+):
+    """Write a synthetic Zooniverse export.
+
+    Args:
+        shared_groups (int): how many extra subjects show the same plate_image and drug as an existing subject
+        bad_subjects (int): how many subjects have subject_data that does not contain their own subject_id
+    """
+
+    rng = random.Random(seed)
+
+    subjects = []
+    for i in range(n_subjects):
+        plate_image = plate_image_name(rng, rng.choice(["CRyPTIC1", "CRyPTIC2"]))
+        design = rng.choice(["", "", "-UKMYC6"])
+        drug = rng.choice(DRUGS)
+        subjects.append(
+            (1000 + i, plate_image + design + MARKERS[flavour] + drug + ".png")
+        )
+
+    for i in range(shared_groups):
+        subjects.append((1000 + n_subjects + i, subjects[i][1]))
+
+    bad = set(rng.sample([i for i, _ in subjects], bad_subjects))
+
+    start = datetime.datetime(2018, 1, 1)
+
+    rows = []
+    for subject_id, image in subjects:
+        for j in range(classifications_per_subject):
+            rows.append((subject_id, image))
+    rng.shuffle(rows)
+
+    with open(filename, "w", newline="") as OUTPUT:
+        writer = None
+        for i, (subject_id, image) in enumerate(rows):
+            created_at = start + datetime.timedelta(minutes=10 * i)
+            duration = rng.randint(5, 90)
+            row = {
+                "classification_id": 10**7 + i,
+                "user_name": "volunteer%i" % rng.randint(1, 25),
+                "user_id": 1,
+                "user_ip": "x",
+                "workflow_id": 1,
+                "workflow_name": "w",
+                "workflow_version": 1,
+                "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S UTC"),
+                "gold_standard": "",
+                "expert": "",
+                "metadata": json.dumps(
+                    {
+                        "live_project": True,
+                        "started_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                        "finished_at": (
+                            created_at + datetime.timedelta(seconds=duration)
+                        ).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                    }
+                ),
+                "annotations": json.dumps(_annotations(rng, flavour)),
+                "subject_data": json.dumps(
+                    {
+                        str(subject_id + (10**6 if subject_id in bad else 0)): {
+                            "retired": None,
+                            "Filename": image,
+                        }
+                    }
+                ),
+                "subject_ids": subject_id,
+            }
+            if writer is None:
+                writer = csv.DictWriter(OUTPUT, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+
+    return filename
+
+
+def load_export(filename, flavour, **kwargs):
+    """Read and decode a synthetic export as the analyse script does."""
+
+    if flavour == "pro":
+        kwargs["live_rows"] = False
+
+    classifications = bashthebug.BashTheBugClassifications(
+        zooniverse_file=str(filename), flavour=flavour, **kwargs
+    )
+    classifications.extract_classifications()
+    return classifications
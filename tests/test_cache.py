@@ -0,0 +1,49 @@
+import pandas
+import pytest
+
+from .helpers import load_export
+
+
+def test_warm_cache_gives_same_tables(bad_export, flavour, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+
+    cold = load_export(bad_export, flavour, cache_dir=cache_dir)
+    cold.create_measurements_table()
+
+    warm = load_export(bad_export, flavour, cache_dir=cache_dir)
+    warm.create_measurements_table()
+
+    pandas.testing.assert_frame_equal(warm.classifications, cold.classifications)
+    pandas.testing.assert_frame_equal(warm.measurements, cold.measurements)
+    assert warm.parse_errors.counts == cold.parse_errors.counts
+
+
+def test_strict_raises_on_warm_cache(bad_export, flavour, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+
+    load_export(bad_export, flavour, cache_dir=cache_dir)
+
+    with pytest.raises(ValueError):
+        load_export(bad_export, flavour, cache_dir=cache_dir, strict=True)
+
+    # and a lenient run afterwards is not made strict
+    lenient = load_export(bad_export, flavour, cache_dir=cache_dir)
+    assert not lenient.parse_errors.strict
+    assert lenient.parse_errors.total > 0
+
+
+def test_filtered_table_is_not_served_from_cache(export, flavour, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+
+    warm = load_export(export, flavour, cache_dir=cache_dir)
+    warm.create_measurements_table()
+
+    classifications = load_export(export, flavour, cache_dir=cache_dir)
+    classifications.classifications = classifications.classifications.loc[
+        classifications.classifications["drug"] == "INH"
+    ]
+    classifications.create_measurements_table()
+
+    n_inh = (warm.classifications["drug"] == "INH").sum()
+    assert 0 < n_inh < len(warm.classifications)
+    assert classifications.measurements["count"].sum() == n_inh
@@ -0,0 +1,47 @@
+import numpy
+import pytest
+
+from bashthebug import DawidSkene
+
+from .helpers import load_export
+
+
+def test_recovers_truth_from_unreliable_volunteers():
+    rng = numpy.random.default_rng(0)
+
+    truth = rng.integers(1, 6, size=200)
+    accuracy = numpy.concatenate([numpy.full(5, 0.9), numpy.full(15, 0.3)])
+
+    volunteers, subjects, labels = [], [], []
+    for subject, label in enumerate(truth):
+        for volunteer in rng.choice(len(accuracy), size=9, replace=False):
+            correct = rng.random() < accuracy[volunteer]
+            volunteers.append(volunteer)
+            subjects.append(subject)
+            labels.append(label if correct else rng.integers(1, 6))
+
+    model = DawidSkene().fit(volunteers, subjects, labels)
+
+    assert (model.consensus == truth[model.subjects]).mean() > 0.9
+    assert model.reliability[:5].min() > model.reliability[5:].max()
+
+
+def test_missing_values_are_rejected():
+    with pytest.raises(AssertionError, match="missing values"):
+        DawidSkene().fit(["a", None, "b"], [1, 1, 2], [1, 2, 3])
+
+
+def test_classifications_without_volunteer_are_ignored(export, flavour):
+    classifications = load_export(export, flavour)
+    classifications.classifications.loc[
+        classifications.classifications.index[:5], "user_name"
+    ] = None
+    classifications.create_measurements_table()
+
+    classifications.calculate_consensus_dawid_skene()
+
+    assert classifications.measurements["ds_dilution"].notna().all()
+    assert (
+        classifications.volunteer_reliability["classifications"].sum()
+        <= len(classifications.classifications) - 5
+    )
@@ -0,0 +1,78 @@
+import copy
+
+import numpy, pandas
+import pytest
+
+from bashthebug import engines
+
+from .helpers import load_export
+
+COLUMNAR = [i for i in engines.available_engines() if i != "pandas"]
+
+pytestmark = pytest.mark.skipif(
+    not COLUMNAR, reason="neither polars nor duckdb is installed"
+)
+
+
+@pytest.fixture
+def classifications(export, flavour):
+    classifications = load_export(export, flavour, engine="pandas")
+    classifications.calculate_task_durations()
+
+    # durations read back from SQLite can be NULL
+    durations = classifications.classifications["task_duration"].astype(float)
+    durations.iloc[::7] = numpy.nan
+    classifications.classifications["task_duration"] = durations
+
+    return classifications
+
+
+def _tables(classifications, engine):
+    classifications = copy.deepcopy(classifications)
+    classifications.engine = engine
+
+    tables = {}
+    for index in ["PLATEIMAGE", "PLATE"]:
+        classifications.create_measurements_table(index)
+        tables["measurements", index] = classifications.measurements
+        classifications.create_durations_table(index)
+        tables["durations", index] = classifications.durations
+
+    classifications.calculate_consensus_median()
+    tables["consensus"] = classifications.classifications[
+        ["bashthebug_median", "median_delta"]
+    ]
+
+    return tables
+
+
+@pytest.mark.parametrize("engine", COLUMNAR)
+def test_engines_match_pandas(classifications, engine):
+    expected = _tables(classifications, "pandas")
+    result = _tables(classifications, engine)
+
+    assert expected.keys() == result.keys()
+
+    for table in expected:
+        pandas.testing.assert_frame_equal(
+            result[table], expected[table], check_index_type=False, obj=str(table)
+        )
+
+
+@pytest.mark.parametrize("engine", COLUMNAR)
+def test_missing_durations_are_ignored(engine):
+    table = pandas.DataFrame(
+        {
+            "plate": ["a", "a", "a"],
+            "reading_day": [7, 7, 7],
+            "drug": ["INH", "INH", "INH"],
+            "task_duration": [1.0, 3.0, numpy.nan],
+        }
+    )
+
+    durations = engines.aggregate_durations(
+        table, ["plate", "reading_day", "drug"], ["median", "mean", "count"], engine
+    )
+
+    assert durations.iloc[0].tolist() == [2.0, 2.0, 2]
+    assert durations[("task_duration", "count")].dtype == numpy.int64
@@ -0,0 +1,166 @@
+import random
+
+import pandas
+import pytest
+
+import bashthebug
+from bashthebug import filenames
+
+from .helpers import DRUGS, MARKERS, plate_image_name
+
+N_NAMES = 500
+
+
+def _reference_plateimage(filename, flavour):
+    # the row-by-row parsing that extract_classifications() did before the filename grammar
+    study_id = "CRyPTIC1" if filename[:3] in ("H37", "CRY") else "CRyPTIC2"
+    drug = filename[-3:]
+
+    if "UKMYC" in filename:
+        plate_image = filename.split("-UKMYC")[0]
+        marker = "-zooniverse" if flavour == "regular" else "-discrepancy"
+        plate_design = filename.split(plate_image + "-")[1].split(marker)[0]
+    else:
+        plate_image = filename.split(MARKERS[flavour])[0]
+        plate_design = "UKMYC5"
+
+    plate = plate_image[: plate_image.rfind("-")]
+
+    if study_id == "CRyPTIC1":
+        reading_day = int(plate_image.split("-")[-1])
+        site = plate_image.split("-")[-4]
+    else:
+        site = plate_image[:2]
+        try:
+            reading_day = int(plate_image.split("-")[-1])
+        except ValueError:
+            reading_day = None
+
+    return {
+        "plate_image": plate_image,
+        "plate_design": plate_design,
+        "drug": drug,
+        "plate": plate,
+        "study_id": study_id,
+        "reading_day": reading_day,
+        "site": site,
+    }
+
+
+def _reference_reading_day(row):
+    # extract_reading_day() before the filename grammar
+    if row["study_id"] == "CRyPTIC1":
+        return int(row["plate_image"].split("-")[-1])
+    elif "UKMYC" in row["plate_image"]:
+        return int(row["plate_image"].split("-")[-2])
+    else:
+        return int(row["plate_image"].split("-")[-1])
+
+
+def _reference_site(row):
+    # extract_site() before the filename grammar
+    if row["study_id"] == "CRyPTIC1":
+        return row["plate_image"].split("-")[-4]
+    else:
+        return row["plate_image"][:2]
+
+
+def _names(seed):
+    rng = random.Random(seed)
+    for i in range(N_NAMES):
+        study = rng.choice(["CRyPTIC1", "CRyPTIC2"])
+        plate_image = plate_image_name(rng, study)
+        if study == "CRyPTIC2" and rng.random() < 0.1:
+            plate_image = plate_image.rsplit("-", 1)[0] + "-xx"
+        yield study, plate_image, rng.choice(["", "-UKMYC5", "-UKMYC6"]), rng.choice(
+            DRUGS
+        )
+
+
+def _value(value):
+    return None if pandas.isna(value) else value
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parse_filenames_matches_reference(flavour, seed):
+    names = [
+        plate_image + design + MARKERS[flavour] + drug
+        for _, plate_image, design, drug in _names(seed)
+    ]
+
+    parsed = filenames.parse_filenames(names, flavour)
+
+    for name in names:
+        expected = _reference_plateimage(name, flavour)
+        result = {i: _value(parsed.loc[name, i]) for i in expected}
+        assert result == expected, name
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parse_plate_images_matches_helpers(seed):
+    classifications = bashthebug.BashTheBugClassifications(flavour="regular")
+
+    rows = list(_names(seed))
+    names = [plate_image + design for _, plate_image, design, _ in rows]
+
+    parsed = filenames.parse_plate_images(names)
+
+    for (study, plate_image, design, _), name in zip(rows, names):
+        fields = parsed.loc[name]
+        parts = plate_image.split("-")
+
+        row = pandas.Series({"filename": name, "plate_image": name, "study_id": study})
+        assert classifications.determine_study(row) == study == fields["study_id"]
+        assert classifications.extract_site(row) == _value(fields["site"])
+        assert classifications.extract_reading_day(row) == _value(fields["reading_day"])
+
+        # the old helpers miscount the fields of CRyPTIC1 names with a UKMYC suffix and fail on non-numeric days
+        if not (study == "CRyPTIC1" and design):
+            assert classifications.extract_site(row) == _reference_site(row)
+            if parts[-1].isdigit():
+                assert classifications.extract_reading_day(
+                    row
+                ) == _reference_reading_day(row)
+
+        # the fields must be the same whether or not there is a UKMYC suffix
+        assert fields["plate"] == plate_image.rsplit("-", 1)[0]
+        assert _value(fields["plate_design"]) == (design[1:] or None)
+        if parts[-1].isdigit():
+            assert fields["reading_day"] == int(parts[-1])
+        else:
+            assert pandas.isna(fields["reading_day"])
+
+        if study == "CRyPTIC1":
+            assert fields["site"] == parts[-4]
+            assert fields["replicate"] == int(parts[-3])
+            assert fields["reader"] == int(parts[-2])
+            assert fields["strain"] == "-".join(parts[:-4])
+        else:
+            assert fields["site"] == plate_image[:2]
+            assert pandas.isna(fields["replicate"]) and pandas.isna(fields["reader"])
+
+
+def test_extract_cryptic1_fields():
+    classifications = bashthebug.BashTheBugClassifications(flavour="regular")
+    classifications.classifications = pandas.DataFrame(
+        {"plate_image": ["CRY-0001-03-1-2-14", "H37Rv-a-04-2-1-7"]}
+    )
+
+    classifications.extract_cryptic1_fields()
+
+    assert classifications.classifications["site"].tolist() == [3, 4]
+    assert classifications.classifications["replicate"].tolist() == [1, 2]
+    assert classifications.classifications["reader"].tolist() == [2, 1]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parse_plate_image_matches_parse_plate_images(seed):
+    names = [plate_image + design for _, plate_image, design, _ in _names(seed)]
+    names += ["nohyphen", "CRYnohyphen", "CRY-a-b-7", "ab-UKMYC6"]
+
+    parsed = filenames.parse_plate_images(names)
+
+    for name in names:
+        fields = filenames.parse_plate_image(name)
+        assert list(fields) == filenames.COLUMNS
+        assert fields == {i: _value(parsed.loc[name, i]) for i in fields}, name
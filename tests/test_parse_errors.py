@@ -0,0 +1,55 @@
+import pytest
+
+from bashthebug import ParseErrors
+
+from .helpers import write_export, load_export
+
+
+def test_bad_subjects_are_recorded(bad_export, flavour):
+    classifications = load_export(bad_export, flavour)
+
+    errors = classifications.parse_errors
+    assert errors.counts["filename", None] == 45
+    assert errors.counts["annotation", -109] == 45
+
+    # the rows are kept, and count as failed
+    dilutions = classifications.classifications["bashthebug_dilution"]
+    assert (dilutions == -109).sum() == 45
+
+
+def test_strict_raises(bad_export, flavour):
+    with pytest.raises(ValueError):
+        load_export(bad_export, flavour, strict=True)
+
+
+def test_unrecognised_reason_for_cannot_classify(tmp_path):
+    export = write_export(tmp_path / "export.csv", flavour="pro")
+    classifications = load_export(export, "pro")
+
+    row = classifications.classifications.iloc[0].copy()
+    row["annotations"] = [
+        {
+            "task_label": "being mindful of the existing classification results",
+            "value": "Cannot classify",
+        },
+        {"value": "Something new"},
+    ]
+
+    assert classifications._parse_annotation(row) == -110
+    assert classifications.parse_errors.counts["annotation", -110] == 1
+
+
+def test_expected_codes_are_not_failures():
+    errors = ParseErrors(strict=True)
+
+    # testing-task classifications never raise and are reported separately
+    for i in range(4):
+        errors.record("annotation", i, -101)
+
+    assert errors.total == 0
+    assert errors.expected == 4
+
+    errors.strict = False
+    errors.record("filename", 5)
+    assert errors.total == 1
+    assert errors.expected == 4
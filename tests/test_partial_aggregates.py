@@ -0,0 +1,68 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas
+import pytest
+
+import bashthebug
+
+from .helpers import load_export
+
+N_SHARDS = 4
+
+
+def _run_shard(export, flavour, shard, index, filename):
+    classifications = bashthebug.BashTheBugClassifications(
+        zooniverse_file=str(export),
+        flavour=flavour,
+        live_rows=(flavour == "regular"),
+    )
+    classifications.select_shard(shard, N_SHARDS)
+    classifications.extract_classifications()
+    classifications.calculate_task_durations()
+    classifications.save_partial_aggregates(filename, index=index)
+    return filename
+
+
+@pytest.mark.parametrize("index", ["PLATEIMAGE", "PLATE"])
+def test_sharded_run_matches_single_run(export, flavour, index, tmp_path):
+    with ProcessPoolExecutor(max_workers=N_SHARDS) as executor:
+        filenames = list(
+            executor.map(
+                _run_shard,
+                [export] * N_SHARDS,
+                [flavour] * N_SHARDS,
+                range(N_SHARDS),
+                [index] * N_SHARDS,
+                [str(tmp_path / ("shard%i.pkl.bz2" % i)) for i in range(N_SHARDS)],
+            )
+        )
+
+    merged = bashthebug.BashTheBugClassifications(flavour=flavour)
+    merged.load_partial_aggregates(filenames)
+
+    single = load_export(export, flavour)
+    single.calculate_task_durations()
+    single.create_measurements_table(index)
+    single.create_durations_table(index)
+
+    pandas.testing.assert_frame_equal(
+        merged.measurements, single.measurements, check_index_type=False
+    )
+
+    # the durations are combined from sums, so only agree to rounding
+    pandas.testing.assert_frame_equal(
+        merged.durations, single.durations, check_index_type=False
+    )
+
+
+def test_partials_from_another_version_are_rejected(export, flavour, tmp_path):
+    classifications = load_export(export, flavour)
+    classifications.save_partial_aggregates(str(tmp_path / "shard.pkl"))
+
+    contents = pandas.read_pickle(str(tmp_path / "shard.pkl"))
+    contents["version"] = "0.0.0"
+    pandas.to_pickle(contents, str(tmp_path / "shard.pkl"))
+
+    merged = bashthebug.BashTheBugClassifications(flavour=flavour)
+    with pytest.raises(AssertionError, match="0.0.0"):
+        merged.load_partial_aggregates([str(tmp_path / "shard.pkl")])
@@ -0,0 +1,94 @@
+import bz2, gzip, lzma, zipfile
+
+import pandas
+import pytest
+
+from bashthebug.PipelinedReader import PipelinedReader, save_compressed_pickle
+
+CONTENTS = b"".join(b"%i,%i\n" % (i, i * i) for i in range(200000))
+
+
+def _compress(filename):
+    if filename.suffix == ".gz":
+        filename.write_bytes(gzip.compress(CONTENTS))
+    elif filename.suffix == ".bz2":
+        filename.write_bytes(bz2.compress(CONTENTS))
+    elif filename.suffix == ".xz":
+        filename.write_bytes(lzma.compress(CONTENTS))
+    elif filename.suffix == ".zip":
+        with zipfile.ZipFile(filename, "w") as archive:
+            archive.writestr("export.csv", CONTENTS)
+
+
+@pytest.mark.parametrize("extension", [".gz", ".bz2", ".xz", ".zip"])
+def test_reads_whole_file(tmp_path, extension):
+    filename = tmp_path / ("export.csv" + extension)
+    _compress(filename)
+
+    reader = PipelinedReader(str(filename), block_size=64 * 1024, buffers=2)
+    assert reader.read() == CONTENTS
+    assert reader.decompressed_bytes == len(CONTENTS)
+    reader.close()
+
+
+def test_small_reads_span_blocks(tmp_path):
+    filename = tmp_path / "export.csv.gz"
+    _compress(filename)
+
+    reader = PipelinedReader(str(filename), block_size=1000, buffers=2)
+
+    # reads that do not line up with the blocks
+    chunks = []
+    buffer = bytearray(333)
+    while True:
+        n = reader.readinto(buffer)
+        if n == 0:
+            break
+        chunks.append(bytes(buffer[:n]))
+    reader.close()
+
+    assert b"".join(chunks) == CONTENTS
+
+
+def test_zip_archive_is_closed(tmp_path, monkeypatch):
+    filename = tmp_path / "export.csv.zip"
+    _compress(filename)
+
+    archives = []
+
+    class RecordingZipFile(zipfile.ZipFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            archives.append(self)
+
+    monkeypatch.setattr(zipfile, "ZipFile", RecordingZipFile)
+
+    reader = PipelinedReader(str(filename))
+    reader.read()
+    reader._thread.join()
+    reader.close()
+
+    assert len(archives) == 1
+    assert archives[0].fp is None
+
+
+@pytest.mark.parametrize("extension", [".bz2", ".gz", ".zst"])
+def test_compressed_pickle_round_trip(tmp_path, extension):
+    if extension == ".zst":
+        pytest.importorskip("zstandard")
+
+    table = pandas.DataFrame({"a": range(100000), "b": ["x"] * 100000})
+    filename = str(tmp_path / ("table.pkl" + extension))
+
+    save_compressed_pickle(table, filename, threads=2, block_size=64 * 1024)
+
+    pandas.testing.assert_frame_equal(pandas.read_pickle(filename), table)
+
+
+def test_compressed_pickle_blocks_are_in_order(tmp_path):
+    filename = str(tmp_path / "contents.pkl.bz2")
+
+    # many more blocks than are allowed in flight at once
+    save_compressed_pickle(CONTENTS, filename, threads=2, block_size=1024)
+
+    assert pandas.read_pickle(filename) == CONTENTS
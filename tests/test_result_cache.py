@@ -0,0 +1,95 @@
+import os, subprocess, sys
+
+import bashthebug
+
+from .helpers import load_export
+
+SCRIPT = os.path.join(
+    os.path.dirname(__file__), "..", "bin", "bashthebug-classifications-analyse.py"
+)
+
+
+def _entry(size):
+    return b"x" * size
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = bashthebug.ResultCache(str(tmp_path), max_bytes=2500)
+
+    for key in ["a", "b"]:
+        cache.save("prefix", key, _entry(1000))
+
+    # b was last used long ago, and a has just been read
+    os.utime(cache._path("prefix", "b"), ns=(0, 0))
+    assert cache.load("prefix", "a")[0]
+
+    cache.save("prefix", "c", _entry(1000))
+
+    assert cache.load("prefix", "a")[0]
+    assert not cache.load("prefix", "b")[0]
+    assert cache.load("prefix", "c")[0]
+    assert cache.size() <= 2500
+
+
+def test_oversized_entries_are_not_kept(tmp_path):
+    cache = bashthebug.ResultCache(str(tmp_path), max_bytes=2500)
+
+    assert cache.save("prefix", "a", _entry(1000))
+    assert not cache.save("prefix", "b", _entry(5000))
+
+    # and the entries already there survive
+    assert cache.load("prefix", "a")[0]
+    assert not cache.load("prefix", "b")[0]
+    assert os.listdir(str(tmp_path)) == [os.path.basename(cache._path("prefix", "a"))]
+
+
+def test_invalidate(tmp_path):
+    cache = bashthebug.ResultCache(str(tmp_path))
+
+    for filename in ["one.csv", "two.csv"]:
+        for key in ["a", "b"]:
+            cache.save(cache.prefix(filename), key, _entry(10))
+
+    assert cache.invalidate("one.csv") == 2
+    assert not cache.load(cache.prefix("one.csv"), "a")[0]
+    assert cache.load(cache.prefix("two.csv"), "a")[0]
+
+    assert cache.invalidate() == 2
+    assert cache.size() == 0
+
+
+def test_clear_cache_option(export, flavour, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+
+    # an export file name the script can make an output stem from
+    marker = (
+        "bash-the-bug-classifications"
+        if flavour == "regular"
+        else "bash-the-bug-pro-classifications"
+    )
+    input_file = str(tmp_path / (marker + "-test.csv"))
+    os.rename(str(export), input_file)
+
+    load_export(input_file, flavour, cache_dir=cache_dir)
+    n_entries = len(os.listdir(cache_dir))
+    assert n_entries > 0
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            SCRIPT,
+            "--input",
+            input_file,
+            "--flavour",
+            flavour,
+            "--cache",
+            cache_dir,
+            "--clear-cache",
+        ],
+        cwd=str(tmp_path),
+        env=dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(__file__), "..")),
+        capture_output=True,
+        text=True,
+    )
+
+    assert "Removed %i cached tables" % n_entries in result.stdout, result.stderr
@@ -0,0 +1,74 @@
+import pandas
+import pytest
+
+from .helpers import write_export, load_export
+
+
+@pytest.fixture
+def shared_export(tmp_path, flavour):
+    # some images are shown as more than one subject, and a few subjects cannot be parsed
+    return write_export(
+        tmp_path / "export.csv",
+        flavour=flavour,
+        n_subjects=80,
+        shared_groups=10,
+        bad_subjects=3,
+    )
+
+
+def _full_run(classifications):
+    measurements = classifications.measurements
+    table = pandas.merge(
+        classifications.classifications[["plate_image", "drug", "bashthebug_dilution"]],
+        measurements[["median"]],
+        left_on=["plate_image", "drug"],
+        right_index=True,
+    )
+    valid = (table["bashthebug_dilution"] > 0) & (table["median"] > 0)
+    delta = (table["bashthebug_dilution"] - table["median"]).abs()
+
+    return {
+        "classifications": len(classifications.classifications),
+        "measured": (measurements["median"] > 0).sum(),
+        "cannot_read": (measurements["median"] == -1).sum(),
+        "insufficient": measurements["median"].isna().sum(),
+        "exact": (valid & (delta == 0)).sum() / valid.sum(),
+        "essential": (valid & (delta <= 1)).sum() / valid.sum(),
+    }
+
+
+def test_whole_sample_reproduces_full_run(shared_export, flavour):
+    full = load_export(shared_export, flavour)
+    full.create_measurements_table()
+    expected = _full_run(full)
+
+    sample = load_export(shared_export, flavour, sample_fraction=1.0)
+    sample.create_measurements_table()
+    summary = sample.sample_summary()
+
+    for statistic, value in expected.items():
+        assert summary.loc[statistic, "estimate"] == pytest.approx(value)
+        assert summary.loc[statistic, "lower"] == pytest.approx(value)
+        assert summary.loc[statistic, "upper"] == pytest.approx(value)
+
+
+def test_sample_is_reproducible_and_stratified(shared_export, flavour):
+    first = load_export(shared_export, flavour, sample_fraction=0.3, sample_seed=1)
+    again = load_export(shared_export, flavour, sample_fraction=0.3, sample_seed=1)
+    other = load_export(shared_export, flavour, sample_fraction=0.3, sample_seed=2)
+
+    assert first.classifications.index.equals(again.classifications.index)
+    assert not first.classifications.index.equals(other.classifications.index)
+
+    strata = first.sample_strata
+    assert (strata["n_sampled"] >= 1).all()
+    assert (strata["n_sampled"] <= strata["n_subjects"]).all()
+
+
+def test_intervals_cover_estimate(shared_export, flavour):
+    sample = load_export(shared_export, flavour, sample_fraction=0.3)
+    sample.create_measurements_table()
+    summary = sample.sample_summary()
+
+    assert (summary["lower"] <= summary["estimate"]).all()
+    assert (summary["estimate"] <= summary["upper"]).all()
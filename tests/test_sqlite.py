@@ -0,0 +1,69 @@
+import sqlite3
+
+import pandas
+import pytest
+
+import bashthebug
+from bashthebug.BashTheBugClassifications import _sqlite_query
+
+from .helpers import load_export
+
+
+def test_loaded_subset_runs_through_pipeline(export, flavour, tmp_path):
+    classifications = load_export(export, flavour)
+    classifications.calculate_task_durations()
+    classifications.save_sqlite(str(tmp_path / "store.db"))
+
+    loaded = bashthebug.BashTheBugClassifications(
+        flavour=flavour, sqlite_file=str(tmp_path / "store.db")
+    )
+
+    pandas.testing.assert_series_equal(
+        loaded.classifications["filename"].sort_index(),
+        classifications.classifications["filename"].sort_index(),
+    )
+
+    loaded.calculate_consensus_median()
+    loaded.create_volunteer_statistics()
+    loaded.create_measurements_table()
+
+    classifications.create_measurements_table()
+    pandas.testing.assert_frame_equal(
+        loaded.measurements, classifications.measurements, check_index_type=False
+    )
+
+
+@pytest.mark.parametrize(
+    "filters, index",
+    [
+        ({"study_id": "CRyPTIC1", "reading_day": 14}, "idx_study_reading_day"),
+        ({"plate": "CRY-0001-03-1-2", "drug": "INH"}, "idx_plate_drug"),
+        ({"from_date": "2018-01-02", "to_date": "2018-01-03"}, "idx_created_at"),
+    ],
+)
+def test_queries_use_indexes(export, flavour, tmp_path, filters, index):
+    classifications = load_export(export, flavour)
+    classifications.save_sqlite(str(tmp_path / "store.db"))
+
+    query, parameters = _sqlite_query(**filters)
+
+    connection = sqlite3.connect(str(tmp_path / "store.db"))
+    plan = connection.execute("EXPLAIN QUERY PLAN " + query, parameters).fetchall()
+    connection.close()
+
+    assert any("USING INDEX " + index in row[-1] for row in plan), plan
+
+
+def test_store_without_filename_is_rejected(export, flavour, tmp_path):
+    classifications = load_export(export, flavour)
+    classifications.save_sqlite(str(tmp_path / "store.db"))
+
+    connection = sqlite3.connect(str(tmp_path / "store.db"))
+    connection.execute("ALTER TABLE classifications DROP COLUMN filename")
+    connection.commit()
+    connection.close()
+
+    with pytest.raises(AssertionError, match="no filename column"):
+        bashthebug.BashTheBugClassifications(
+            flavour=flavour, sqlite_file=str(tmp_path / "store.db")
+        )
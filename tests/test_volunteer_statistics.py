@@ -0,0 +1,56 @@
+import numpy, pandas
+
+from bashthebug import VolunteerStatistics
+
+from .helpers import write_export, load_export
+
+
+def _classifications(export, flavour):
+    classifications = load_export(export, flavour)
+    classifications.calculate_consensus_median()
+    return classifications.classifications.sort_values("created_at")
+
+
+def test_overlapping_updates_match_single_update(export, flavour):
+    table = _classifications(export, flavour)
+
+    single = VolunteerStatistics().update(table, flavour)
+
+    # two exports that overlap by a third of the classifications
+    n = len(table)
+    incremental = VolunteerStatistics()
+    incremental.update(table.iloc[: 2 * n // 3], flavour)
+    incremental.update(table.iloc[n // 3 :], flavour)
+
+    pandas.testing.assert_frame_equal(
+        incremental.to_frame().sort_index(), single.to_frame().sort_index()
+    )
+    assert incremental.last_created_at == {flavour: table["created_at"].max()}
+
+
+def test_flavours_are_tracked_separately(tmp_path):
+    regular = _classifications(
+        write_export(tmp_path / "regular.csv", flavour="regular"), "regular"
+    )
+    pro = _classifications(write_export(tmp_path / "pro.csv", flavour="pro"), "pro")
+
+    statistics = VolunteerStatistics().update(regular, "regular").update(pro, "pro")
+
+    table = statistics.to_frame()
+    assert table["regular"].sum() == len(regular)
+    assert table["pro"].sum() == len(pro)
+
+
+def test_save_and_load(export, flavour, tmp_path):
+    table = _classifications(export, flavour)
+    statistics = VolunteerStatistics().update(table, flavour)
+
+    statistics.save(str(tmp_path / "statistics.npz"))
+    loaded = VolunteerStatistics.load(str(tmp_path / "statistics.npz"))
+
+    pandas.testing.assert_frame_equal(loaded.to_frame(), statistics.to_frame())
+    assert loaded.last_created_at == statistics.last_created_at
+
+    # and nothing already included is added again
+    loaded.update(table, flavour)
+    assert numpy.array_equal(loaded.counts, statistics.counts)